@@ -0,0 +1,251 @@
+'''
+End to end benchmark against the fake api/pipeline (fake_vrchat.py)
+
+Measures, for a Client logged in to an account with [friends] friends
+    login_to_ready_s, login() until on_connect (friends cached)
+    events_per_sec, a burst of [events] pipeline events sent as fast
+        as possible, until the last one reaches its handler
+    latency_p50_ms/latency_p99_ms, frame sent until handler called,
+        friend-location and notification events at a steady [rate]
+    memory_per_friend_bytes, traced allocations from login to ready
+        divided by friends (separate run, tracemalloc is slow)
+
+Each figure is the median of [runs], the server runs in this process
+The events are seeded, so runs of different commits see the same
+traffic. Results are printed as JSON with the commit they ran on,
+--out saves them and --compare prints the change against saved results
+
+    python benchmarks/e2e.py [--friends 1000] [--events 20000] [--rate 2000]
+        [--runs 3] [--out benchmarks/results] [--compare old.json]
+'''
+
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+
+import aiohttp
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from vrcpy import Client
+from vrcpy.codec import get_codec
+
+from fake_vrchat import FakeVRChat
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def commit():
+    try:
+        head = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+            cwd=root, stderr=subprocess.DEVNULL).decode().strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD", "--", "vrcpy"],
+            cwd=root, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+    return head + ("-dirty" if dirty else "")
+
+def percentile(values, p):
+    if not values:
+        return 0
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+class Bench:
+    def __init__(self, fake):
+        self.fake = fake
+        self.loop = asyncio.get_event_loop()
+
+        self.client = Client(base_url=fake.base_url, pipeline_url=fake.pipeline_url)
+        self.ready = asyncio.Event()
+
+        self.handled = 0
+        self.latencies = []
+        self.done = None
+        self.expected = 0
+
+        client = self.client
+
+        async def on_connect():
+            self.ready.set()
+
+        async def on_location(before, after):
+            self._handled(after.location)
+
+        async def on_notification(notification):
+            self._handled(notification["id"])
+
+        async def on_other(*args):
+            self._handled(None)
+
+        client.on_connect = on_connect
+        client.on_friend_location = on_location
+        client.on_notification = on_notification
+        client.on_friend_update = on_other
+        client.on_friend_online = on_other
+        client.on_friend_offline = on_other
+        client.on_friend_active = on_other
+
+    def _handled(self, key):
+        if key is not None:
+            sent = self.fake.sent_at.pop(key, None)
+            if sent is not None:
+                self.latencies.append(self.loop.time() - sent)
+
+        self.handled += 1
+        if self.done is not None and self.handled >= self.expected:
+            self.done.set()
+
+    async def login(self):
+        start = time.perf_counter()
+
+        await self.client.login(b64=base64.b64encode(b"bench:bench").decode())
+        self.task = self.loop.create_task(self.client.start())
+        await self.ready.wait()
+
+        return time.perf_counter() - start
+
+    async def run_events(self, events, rate):
+        self.handled = 0
+        self.latencies = []
+        self.expected = len(events)
+        self.done = asyncio.Event()
+
+        start = time.perf_counter()
+
+        await self.fake.emit(events, rate)
+        await asyncio.wait_for(self.done.wait(), 60 + len(events) / max(rate, 1000))
+
+        return time.perf_counter() - start
+
+    async def close(self):
+        await self.client.logout()
+        await asyncio.gather(self.task, return_exceptions=True)
+
+async def run(args, seq):
+    fake = FakeVRChat(args.friends, seed=args.seed)
+    await fake.start()
+
+    bench = Bench(fake)
+
+    try:
+        ready = await bench.login()
+
+        # Seeded, so every commit sees the same events, seq keeps
+        #   keys unique across runs
+        steady_events = args.rate * args.seconds
+        start = seq * (args.events + steady_events)
+
+        burst = fake.make_events(args.events, start)
+        steady = fake.make_events(steady_events, start + args.events)
+
+        elapsed = await bench.run_events(burst, 0)
+        events_per_sec = len(burst) / elapsed
+
+        await bench.run_events(steady, args.rate)
+        latencies = bench.latencies
+    finally:
+        await bench.close()
+        await fake.stop()
+
+    return {
+        "login_to_ready_s": ready,
+        "events_per_sec": events_per_sec,
+        "latency_p50_ms": percentile(latencies, 0.5) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000
+    }
+
+async def run_memory(args):
+    fake = FakeVRChat(args.friends, seed=args.seed)
+    await fake.start()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    bench = Bench(fake)
+
+    try:
+        await bench.login()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+        await bench.close()
+        await fake.stop()
+
+    return (after - before) / args.friends
+
+def compare(results, path):
+    with open(path) as file:
+        old = json.load(file)
+
+    print("\nChange from %s:" % old["commit"])
+    for name, value in results["results"].items():
+        before = old["results"].get(name)
+        if not before:
+            continue
+
+        print("  %-24s %12.2f -> %12.2f (%+.1f%%)" % (name, before, value,
+            (value - before) / before * 100))
+
+async def main():
+    parser = argparse.ArgumentParser(description="End to end benchmark against a fake VRC api")
+    parser.add_argument("--friends", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=20000, help="events in the burst")
+    parser.add_argument("--rate", type=int, default=2000, help="events/sec of the steady phase")
+    parser.add_argument("--seconds", type=int, default=3, help="length of the steady phase")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="file or directory to save results to")
+    parser.add_argument("--compare", help="results file to compare against")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    runs = []
+    for seq in range(args.runs):
+        runs.append(await run(args, seq))
+
+    results = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+    results["memory_per_friend_bytes"] = await run_memory(args)
+
+    report = {
+        "benchmark": "e2e",
+        "commit": commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "aiohttp": aiohttp.__version__,
+        "codec": get_codec().name,
+        "params": {name: getattr(args, name) for name in
+            ("friends", "events", "rate", "seconds", "runs", "seed")},
+        "results": results,
+        "runs": runs
+    }
+
+    print(json.dumps(report, indent=4))
+
+    if args.out:
+        path = args.out
+        if os.path.isdir(path):
+            path = os.path.join(path, "e2e-%s.json" % report["commit"])
+
+        with open(path, "w") as file:
+            json.dump(report, file, indent=4)
+
+        print("Saved to " + path)
+
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    asyncio.run(main())
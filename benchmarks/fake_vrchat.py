@@ -0,0 +1,325 @@
+'''
+Local stand-in for the VRC api and pipeline, for benchmarks
+
+Serves /config, /auth/user, /auth/user/friends, /users/{id},
+/worlds/{id}, /worlds/{id}/{instance}, /favorites,
+/auth/user/notifications and /logout over http, and the pipeline
+over a websocket at /pipeline
+
+Pipeline traffic (friend-* and notification events about our
+friends) is made up front from a seeded random mix, then sent with
+emit() at a fixed rate, or as fast as possible
+
+    python benchmarks/fake_vrchat.py [friends] [events_per_second]
+
+runs it on its own (port 8780), sending events_per_second to each
+websocket that connects, point a Client at it with
+    Client(base_url=..., pipeline_url=...)
+'''
+
+import os
+import sys
+import json
+import random
+import asyncio
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import payloads
+
+# Share of each event type in the generated traffic
+event_mix = (
+    ("friend-location", 0.5),
+    ("friend-update", 0.15),
+    ("friend-online", 0.1),
+    ("friend-offline", 0.1),
+    ("friend-active", 0.05),
+    ("notification", 0.1)
+)
+
+class FakeVRChat:
+    def __init__(self, friends=1000, worlds=50, seed=0, host="127.0.0.1", port=8780):
+        '''
+            friends, int
+            Friends of the logged in user, half online half offline
+
+            worlds, int
+            Worlds friends are spread over
+
+            seed, int
+            Seed of the generated traffic, same seed same events
+        '''
+
+        self.friends = friends
+        self.worlds = worlds
+        self.seed = seed
+        self.host = host
+        self.port = port
+
+        self.sockets = set()
+        self.requests = {}
+
+        # {location or notification id: loop time it was sent}
+        self.sent_at = {}
+        self.sent = 0
+
+        self.runner = None
+        self.auto_rate = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/api/1/config", self.config)
+        self.app.router.add_get("/api/1/auth/user", self.auth_user)
+        self.app.router.add_get("/api/1/auth/user/friends", self.friend_list)
+        self.app.router.add_get("/api/1/auth/user/notifications", self.notifications)
+        self.app.router.add_get("/api/1/users/{id}", self.user)
+        self.app.router.add_get("/api/1/worlds/{id}", self.world)
+        self.app.router.add_get("/api/1/worlds/{id}/{instance}", self.instance)
+        self.app.router.add_get("/api/1/favorites", self.favorites)
+        self.app.router.add_post("/api/1/favorites", self.add_favorite)
+        self.app.router.add_delete("/api/1/favorites/{id}", self.ok)
+        self.app.router.add_put("/api/1/logout", self.ok)
+        self.app.router.add_get("/pipeline", self.pipeline)
+
+    @property
+    def base_url(self):
+        return "http://%s:%s/api/1" % (self.host, self.port)
+
+    @property
+    def pipeline_url(self):
+        return "ws://%s:%s/pipeline" % (self.host, self.port)
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+    async def stop(self):
+        for ws in list(self.sockets):
+            await ws.close()
+
+        await self.runner.cleanup()
+
+    def _count(self, request):
+        name = request.match_info.route.resource.canonical
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+    def _index(self, id):
+        # usr_00000012-... is friend 12
+        try:
+            return int(id[4:12])
+        except ValueError:
+            return 0
+
+    # Http
+
+    async def config(self, request):
+        self._count(request)
+        return web.json_response({"apiKey": "JlE5Jldo5Jibnk5O5hTx6XVqsJu4WJ26"})
+
+    async def auth_user(self, request):
+        self._count(request)
+
+        resp = web.json_response(payloads.current_user(0, self.friends))
+        resp.headers.add("Set-Cookie", "auth=authcookie_bench; Path=/")
+        return resp
+
+    async def friend_list(self, request):
+        self._count(request)
+
+        offset = int(request.query.get("offset", 0))
+        n = int(request.query.get("n", 60))
+
+        # Online friends are the first half, like current_user's lists
+        half = self.friends // 2
+        if request.query.get("offline") == "true":
+            start, end = half + offset, self.friends
+        else:
+            start, end = offset, half
+
+        return web.json_response([payloads.user(i) for i in range(start, min(end, start + n))])
+
+    async def notifications(self, request):
+        self._count(request)
+
+        offset = int(request.query.get("offset", 0))
+        n = int(request.query.get("n", 60))
+
+        return web.json_response([payloads.notification(i) for i in range(offset, min(100, offset + n))])
+
+    async def user(self, request):
+        self._count(request)
+        return web.json_response(payloads.user(self._index(request.match_info["id"])))
+
+    async def world(self, request):
+        self._count(request)
+
+        try:
+            i = int(request.match_info["id"].split("_")[-1])
+        except ValueError:
+            i = 0
+
+        return web.json_response(payloads.world(i, instances=3))
+
+    async def instance(self, request):
+        self._count(request)
+
+        world_id = request.match_info["id"]
+        return web.json_response(payloads.instance(world_id, request.match_info["instance"].split("~")[0]))
+
+    async def favorites(self, request):
+        self._count(request)
+
+        offset = int(request.query.get("offset", 0))
+        n = int(request.query.get("n", 60))
+
+        return web.json_response([
+            {"id": "fvrt_%s" % i, "type": "friend", "favoriteId": payloads.user(i)["id"], "tags": ["group_0"]}
+            for i in range(offset, min(self.friends, offset + n, 150))
+        ])
+
+    async def add_favorite(self, request):
+        self._count(request)
+
+        body = await request.json()
+        return web.json_response({"id": "fvrt_new", "type": body["type"],
+            "favoriteId": body["favoriteId"], "tags": body["tags"]})
+
+    async def ok(self, request):
+        self._count(request)
+        return web.json_response({"success": {"message": "ok"}})
+
+    # Pipeline
+
+    async def pipeline(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        self.sockets.add(ws)
+
+        if self.auto_rate:
+            emitting = asyncio.ensure_future(self._emit_forever(ws, self.auto_rate))
+
+        try:
+            async for message in ws:
+                pass
+        finally:
+            self.sockets.discard(ws)
+            if self.auto_rate:
+                emitting.cancel()
+
+        return ws
+
+    def make_events(self, count, start=0):
+        '''
+        Returns list of (key, frame), key is what sent_at is keyed by
+
+            count, int
+            Number of events
+
+            start, int
+            Sequence number of the first event, keeps keys unique
+                across calls
+        '''
+
+        rand = random.Random(self.seed + start)
+        types = [t for t, _ in event_mix]
+        weights = [w for _, w in event_mix]
+
+        events = []
+        for seq in range(start, start + count):
+            type = rand.choices(types, weights)[0]
+            i = rand.randrange(self.friends)
+            key = None
+
+            user = payloads.user(i)
+
+            if type == "notification":
+                content = payloads.notification(seq)
+                key = content["id"]
+            elif type == "friend-offline":
+                content = {"userId": user["id"]}
+            else:
+                if type == "friend-location":
+                    world = "wrld_%s" % rand.randrange(self.worlds)
+                    user["location"] = "%s:%s~bench" % (world, seq)
+                    key = user["location"]
+
+                    content = {"userId": user["id"], "user": user, "location": user["location"],
+                        "instance": "%s~bench" % seq, "world": payloads.limited_world(0)}
+                else:
+                    content = {"userId": user["id"], "user": user}
+
+            frame = json.dumps({"type": type, "content": json.dumps(content)})
+            events.append((key, frame))
+
+        return events
+
+    async def emit(self, events, rate=0, sockets=None):
+        '''
+        Sends events to websockets
+
+            events, list
+            From make_events
+
+            rate, int
+            Events per second, 0 for as fast as possible
+
+            sockets, list
+            Websockets to send to, None for every connected one
+        '''
+
+        if sockets is None:
+            sockets = list(self.sockets)
+
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+
+        for n, (key, frame) in enumerate(events):
+            if rate:
+                delay = start + n / rate - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            if key is not None:
+                self.sent_at[key] = loop.time()
+
+            for ws in sockets:
+                await ws.send_str(frame)
+
+            self.sent += 1
+
+            # Let the client run, as it would with a real network between us
+            if not rate and n % 100 == 99:
+                await asyncio.sleep(0)
+
+    async def _emit_forever(self, ws, rate):
+        seq = 0
+        while not ws.closed:
+            # Nobody reads sent_at when running on our own
+            self.sent_at.clear()
+            await self.emit(self.make_events(rate, seq), rate, [ws])
+            seq += rate
+
+async def main():
+    friends = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rate = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    fake = FakeVRChat(friends)
+    fake.auto_rate = rate
+    await fake.start()
+
+    print("Api at %s, pipeline at %s (%s friends, %s events/sec)" % (
+        fake.base_url, fake.pipeline_url, friends, rate))
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await fake.stop()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
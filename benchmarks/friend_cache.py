@@ -0,0 +1,95 @@
+'''
+Friend cache benchmark
+
+Replays bursts of friend events against 5k cached friends,
+comparing the old list handling with FriendCache
+
+    python benchmarks/friend_cache.py [friends] [events_per_second] [seconds]
+'''
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from vrcpy.cache import FriendCache
+
+class FakeUser:
+    def __init__(self, id, location, status, world_id):
+        self.id = id
+        self.location = location
+        self.status = status
+        self.world_id = world_id
+
+def make_event(n_friends, n_worlds=200):
+    world = "wrld_%s" % random.randrange(n_worlds)
+
+    return FakeUser(
+        "usr_%s" % random.randrange(n_friends),
+        "%s:%s" % (world, random.randrange(50)),
+        random.choice(["active", "join me", "ask me", "busy"]),
+        world
+    )
+
+def list_apply(friends, user):
+    # Behaviour of Client._on_friend_* before FriendCache
+    friend = None
+    for cached in friends:
+        if cached.id == user.id:
+            friend = cached
+            break
+
+    if friend is not None:
+        friends.remove(friend)
+    friends.append(user)
+
+def cache_apply(friends, user):
+    friends.put(user)
+
+def run(name, friends, apply, bursts):
+    start = time.perf_counter()
+
+    for burst in bursts:
+        for user in burst:
+            apply(friends, user)
+
+    elapsed = time.perf_counter() - start
+    events = sum(len(burst) for burst in bursts)
+
+    print("%-12s %8.1f ms total  %8.2f us/event  %10.0f events/sec" % (
+        name, elapsed * 1000, elapsed / events * 1e6, events / elapsed))
+
+def main():
+    n_friends = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    per_second = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    seconds = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    random.seed(0)
+
+    initial = [make_event(n_friends) for _ in range(n_friends)]
+    for i, user in enumerate(initial):
+        user.id = "usr_%s" % i
+
+    bursts = [
+        [make_event(n_friends) for _ in range(per_second)]
+        for _ in range(seconds)
+    ]
+
+    print("%s friends, %s bursts of %s events" % (n_friends, seconds, per_second))
+
+    run("list", list(initial), list_apply, bursts)
+    run("FriendCache", FriendCache(initial), cache_apply, bursts)
+
+    cache = FriendCache(initial)
+    start = time.perf_counter()
+    for _ in range(per_second):
+        cache.get("usr_%s" % random.randrange(n_friends))
+        cache.by_world("wrld_%s" % random.randrange(200))
+    elapsed = time.perf_counter() - start
+
+    print("%-12s %8.2f us/lookup (get + by_world)" % ("lookups", elapsed / per_second * 1e6))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+'''
+Model construction benchmark
+
+Builds each model class from a sample payload and prints objects/sec
+"lazy" builds lazy objects and reads two fields of each, like an
+event handler would
+
+    python benchmarks/models.py [objects] [lazy]
+'''
+
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from vrcpy.user import LimitedUser, User, CurrentUser
+from vrcpy.world import LimitedWorld, World, Instance
+from vrcpy.avatar import Avatar
+from vrcpy.notification import InviteNotification
+
+import payloads
+
+cases = [
+    ("LimitedUser", LimitedUser, payloads.limited_user(), "location"),
+    ("User", User, payloads.user(), "location"),
+    ("CurrentUser", CurrentUser, payloads.current_user(friends=100), "display_name"),
+    ("LimitedWorld", LimitedWorld, payloads.limited_world(), "name"),
+    ("World", World, payloads.world(), "name"),
+    ("Instance", Instance, payloads.instance(), "location"),
+    ("Avatar", Avatar, payloads.avatar(), "name"),
+    ("InviteNotification", InviteNotification, payloads.notification(), "type")
+]
+
+class FakeClient:
+    lazy_objects = False
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    loop = asyncio.get_event_loop()
+
+    client = FakeClient()
+    client.lazy_objects = "lazy" in sys.argv[2:]
+
+    for name, cls, obj, field in cases:
+        best = None
+
+        for _ in range(3):
+            start = time.perf_counter()
+            for _ in range(n):
+                built = cls(client, obj, loop)
+                built.id
+                getattr(built, field)
+            elapsed = time.perf_counter() - start
+
+            best = elapsed if best is None else min(best, elapsed)
+
+            # Let any __cinit__ tasks finish
+            await asyncio.sleep(0)
+
+        print("%-20s %10.0f objects/sec%s" % (name, n / best,
+            " (lazy)" if client.lazy_objects else ""))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+'''
+Sample VRC api payloads shared by the benchmarks
+'''
+
+def limited_user(i=0):
+    return {
+        "username": "user%s" % i,
+        "displayName": "User %s" % i,
+        "id": "usr_%08d-0000-0000-0000-000000000000" % i,
+        "currentAvatarImageUrl": "https://api.vrchat.cloud/api/1/file/file_x/1/file",
+        "currentAvatarThumbnailImageUrl": "https://api.vrchat.cloud/api/1/image/file_x/1/256",
+        "last_platform": "standalonewindows",
+        "tags": ["system_avatar_access", "system_world_access", "system_trust_basic"],
+        "developerType": "none",
+        "isFriend": True,
+        "status": "active",
+        "bio": "Hello world",
+        "location": "wrld_%s:%s~hidden(usr_x)~nonce(abc)" % (i % 50, i % 7)
+    }
+
+def user(i=0):
+    obj = limited_user(i)
+    obj.update({
+        "statusDescription": "Just vibing",
+        "last_login": "2020-05-04T18:01:41.000Z",
+        "bioLinks": [],
+        "state": "online",
+        "friendKey": "abcdef",
+        "worldId": "wrld_%s" % (i % 50),
+        "instanceId": "%s~hidden(usr_x)~nonce(abc)" % (i % 7),
+        "allowAvatarCopying": False
+    })
+
+    return obj
+
+def current_user(i=0, friends=0):
+    obj = user(i)
+    ids = ["usr_%08d-0000-0000-0000-000000000000" % n for n in range(friends)]
+
+    obj.update({
+        "pastDisplayNames": [],
+        "emailVerified": True,
+        "hasEmail": True,
+        "hasPendingEmail": False,
+        "acceptedTOSVersion": 7,
+        "hasBirthday": True,
+        "friends": ids,
+        "onlineFriends": ids[:friends // 2],
+        "activeFriends": [],
+        "offlineFriends": ids[friends // 2:],
+        "friendGroupNames": ["group_0", "group_1", "group_2"],
+        "currentAvatar": "avtr_x",
+        "currentAvatarAssetUrl": "https://api.vrchat.cloud/api/1/file/file_y/1/file",
+        "homeLocation": "wrld_home",
+        "hasLoggedInFromClient": True,
+        "twoFactorAuthEnabled": False,
+        "unsubscribe": False,
+        "feature": {"twoFactorAuth": True},
+        "email": "user@example.com",
+        "obfuscatedEmail": "u***@example.com",
+        "steamId": "",
+        "steamDetails": {},
+        "oculusId": ""
+    })
+
+    return obj
+
+def limited_world(i=0):
+    return {
+        "name": "World %s" % i,
+        "id": "wrld_%s" % i,
+        "authorName": "Author",
+        "authorId": "usr_author",
+        "tags": ["system_approved"],
+        "created_at": "2019-01-01T00:00:00.000Z",
+        "updated_at": "2020-01-01T00:00:00.000Z",
+        "releaseStatus": "public",
+        "visits": 1000,
+        "capacity": 32,
+        "favorites": 100,
+        "popularity": 5,
+        "imageUrl": "https://api.vrchat.cloud/api/1/file/file_w/1/file",
+        "thumbnailImageUrl": "https://api.vrchat.cloud/api/1/image/file_w/1/256",
+        "heat": 3,
+        "publicationDate": "2019-01-01T00:00:00.000Z",
+        "labsPublicationDate": "none",
+        "unityPackages": "",
+        "occupants": 20
+    }
+
+def world(i=0, instances=0):
+    obj = limited_world(i)
+    obj.update({
+        "description": "A world",
+        "version": 3,
+        "featured": False,
+        "publicOccupants": 12,
+        "privateOccupants": 8,
+        "assetUrl": "https://api.vrchat.cloud/api/1/file/file_z/1/file",
+        "instances": [["%s~public" % n, 4] for n in range(instances)]
+    })
+
+    return obj
+
+def instance(world_id="wrld_0", i=0):
+    return {
+        "name": "%s" % i,
+        "id": "%s~public" % i,
+        "type": "public",
+        "active": True,
+        "n_users": 4,
+        "capacity": 32,
+        "full": False,
+        "canRequestInvite": False,
+        "location": "%s:%s~public" % (world_id, i),
+        "instanceId": "%s~public" % i,
+        "shortName": "abc%s" % i,
+        "ownerId": "usr_owner",
+        "worldId": world_id,
+        "tags": [],
+        "platforms": {"standalonewindows": 4},
+        "permanent": False,
+        "hidden": "usr_owner"
+    }
+
+def avatar(i=0):
+    return {
+        "name": "Avatar %s" % i,
+        "description": "An avatar",
+        "id": "avtr_%s" % i,
+        "authorName": "Author",
+        "authorId": "usr_author",
+        "tags": [],
+        "version": 1,
+        "featured": False,
+        "created_at": "2019-01-01T00:00:00.000Z",
+        "updated_at": "2020-01-01T00:00:00.000Z",
+        "releaseStatus": "public",
+        "platform": "standalonewindows",
+        "imageUrl": "https://api.vrchat.cloud/api/1/file/file_a/1/file",
+        "thumbnailImageUrl": "https://api.vrchat.cloud/api/1/image/file_a/1/256",
+        "unityVersion": "2018.4.20f1",
+        "assetUrl": "https://api.vrchat.cloud/api/1/file/file_b/1/file"
+    }
+
+def notification(i=0, type="invite"):
+    details = {"worldId": "wrld_0:1~public"} if type == "invite" else {}
+    if type == "requestInvite":
+        details = {"platform": "standalonewindows"}
+
+    return {
+        "id": "not_%s" % i,
+        "senderUsername": "user%s" % i,
+        "sendUserId": "usr_%08d-0000-0000-0000-000000000000" % i,
+        "senderUserId": "usr_%08d-0000-0000-0000-000000000000" % i,
+        "type": type,
+        "created_at": "2020-05-04T18:01:41.000Z",
+        "details": details,
+        "message": "",
+        "seen": False
+    }
@@ -0,0 +1,42 @@
+'''
+Replays a pipeline recording (see vrcpy.recorder) through a Client
+with no network, printing how fast the event path kept up
+
+    python benchmarks/replay.py recording [speed]
+
+speed is 1 for real time, N for N times faster, 0 (default) for as
+fast as possible. Wrap in cProfile/py-spy to profile the event path
+'''
+
+import os
+import sys
+import asyncio
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from vrcpy import Client
+from vrcpy.recorder import PipelineReplayer
+
+async def main():
+    path = sys.argv[1]
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+    logging.basicConfig(level=logging.ERROR)
+
+    client = Client()
+    replayer = PipelineReplayer(client, path, speed=speed)
+
+    # So friend-offline/friend-delete don't need the api
+    replayer.prime_friends()
+
+    stats = await replayer.replay()
+
+    print("%s frames in %.2fs, %.0f frames/sec, at most %.3fs behind" % (
+        stats["frames"], stats["seconds"], stats["frames_per_sec"], stats["behind_max"]))
+    print(client.dispatcher.stats())
+
+    await client.request.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
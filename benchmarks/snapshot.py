@@ -0,0 +1,96 @@
+'''
+Cold vs warm start against the fake api/pipeline (fake_vrchat.py)
+
+Logs in without a snapshot (cold), logs out saving one, then logs in
+again loading it (warm), measuring for each
+    login_to_ready_s, login() until on_connect
+    login_to_friends_s, login() until client.friends is filled
+and for the warm start
+    reconcile_s, until the snapshot friends were refreshed
+    snapshot_bytes, size of the snapshot file
+
+    python benchmarks/snapshot.py [--friends 1000] [--runs 3]
+'''
+
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import logging
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from vrcpy import Client
+
+from fake_vrchat import FakeVRChat
+
+async def login(fake, path):
+    client = Client(base_url=fake.base_url, pipeline_url=fake.pipeline_url, snapshot_path=path)
+    ready = asyncio.Event()
+
+    async def on_connect():
+        ready.set()
+
+    client.on_connect = on_connect
+
+    start = time.perf_counter()
+
+    await client.login(b64=base64.b64encode(b"bench:bench").decode())
+    friends = time.perf_counter() - start if client.friends else None
+
+    task = asyncio.get_event_loop().create_task(client.start())
+    await ready.wait()
+
+    result = {"login_to_ready_s": time.perf_counter() - start}
+    result["login_to_friends_s"] = result["login_to_ready_s"] if friends is None else friends
+
+    if client.reconcile_task is not None:
+        await client.reconcile_task
+        result["reconcile_s"] = time.perf_counter() - start
+
+    await client.logout()
+    await asyncio.gather(task, return_exceptions=True)
+
+    return result
+
+async def run(args):
+    fake = FakeVRChat(args.friends)
+    await fake.start()
+
+    path = os.path.join(tempfile.mkdtemp(), "snapshot.gz")
+
+    try:
+        cold = await login(fake, path)
+        warm = await login(fake, path)
+        warm["snapshot_bytes"] = os.path.getsize(path)
+    finally:
+        await fake.stop()
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+
+    return cold, warm
+
+async def main():
+    parser = argparse.ArgumentParser(description="Cold vs warm start against a fake VRC api")
+    parser.add_argument("--friends", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    runs = [await run(args) for _ in range(args.runs)]
+
+    report = {"friends": args.friends}
+    for n, name in enumerate(("cold", "warm")):
+        report[name] = {key: statistics.median(run[n][key] for run in runs) for key in runs[0][n]}
+
+    print(json.dumps(report, indent=4))
+
+if __name__ == "__main__":
+    asyncio.run(main())
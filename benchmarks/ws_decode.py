@@ -0,0 +1,84 @@
+'''
+Pipeline frame decode benchmark
+
+Pushes synthetic pipeline frames through the old decode path
+(message.json() + json.loads(content) for every frame) and through
+Client._on_frame with each codec, printing messages/sec
+
+    python benchmarks/ws_decode.py [frames]
+'''
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from vrcpy import Client
+from vrcpy.codec import get_codec, orjson
+
+import payloads
+
+def make_frames(n):
+    random.seed(0)
+    frames = []
+
+    for i in range(n):
+        roll = random.random()
+        user = payloads.user(i % 500)
+
+        if roll < 0.5:
+            frame = {"type": "friend-location", "content": {"userId": user["id"], "user": user,
+                "location": user["location"], "instance": user["instanceId"], "world": {}}}
+        elif roll < 0.7:
+            frame = {"type": "friend-offline", "content": {"userId": user["id"]}}
+        elif roll < 0.8:
+            frame = {"type": "notification", "content": payloads.notification(i)}
+        else:
+            # Events we don't handle
+            frame = {"type": "user-update", "content": {"userId": user["id"], "user": user}}
+
+        frame["content"] = json.dumps(frame["content"])
+        frames.append(json.dumps(frame))
+
+    return frames
+
+class NullDispatcher:
+    async def put(self, type, content):
+        pass
+
+async def run_client(codec, frames):
+    client = Client(codec=codec)
+    client.dispatcher = NullDispatcher()
+
+    start = time.perf_counter()
+    for frame in frames:
+        await client._on_frame(frame)
+
+    return time.perf_counter() - start
+
+def run_old(frames):
+    start = time.perf_counter()
+    for frame in frames:
+        message = json.loads(frame)
+        json.loads(message["content"])
+
+    return time.perf_counter() - start
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    frames = make_frames(n)
+
+    print("%s frames, %.0f bytes avg" % (n, sum(map(len, frames)) / n))
+    print("%-24s %10.0f messages/sec" % ("old (json twice)", n / run_old(frames)))
+
+    codecs = ["json"] + (["orjson"] if orjson is not None else [])
+    for name in codecs:
+        elapsed = await run_client(get_codec(name), frames)
+        print("%-24s %10.0f messages/sec" % ("_on_frame (%s)" % name, n / elapsed))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,5 @@
 from vrcpy.client import Client
+from vrcpy.pool import ClientPool
 
 __title__ = "vrcpy"
 __author__ = "Katistic"
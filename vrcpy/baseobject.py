@@ -3,14 +3,55 @@ import logging
 from vrcpy.errors import ObjectErrors
 
 class BaseObject:
+    # "name": {"dict_key": "id", "type": str}
+    # Only the fields a class adds, parents' fields are merged in
+    # and compiled once per class by __init_subclass__
+    required = {}
+    optional = {}
+
+    # Objects with a kind get one live object per entity per client,
+    #   keyed by (kind, obj[_identity_key]), see Client._canonical
+    _identity_kind = None
+    _identity_key = "id"
+
+    _required_fields = ()
+    _optional_fields = ()
+    _lazy_fields = {}
+    _required_keys = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        cls._required_fields = cls._compile_fields("required")
+        cls._optional_fields = cls._compile_fields("optional")
+
+        # {"name": (dict_key, type)} for decoding fields on first access
+        cls._lazy_fields = {
+            name: (key, t) for name, key, t in cls._required_fields + cls._optional_fields
+        }
+        cls._required_keys = frozenset(key for name, key, t in cls._required_fields)
+
+    @classmethod
+    def _compile_fields(cls, attr):
+        # Returns tuple of (name, dict_key, type), type is None when
+        #   the value is stored as is
+        fields = {}
+        for klass in reversed(cls.__mro__):
+            fields.update(klass.__dict__.get(attr, {}))
+
+        return tuple(
+            (
+                name,
+                field["dict_key"],
+                None if field["type"] is dict or field["type"] is list else field["type"]
+            )
+            for name, field in fields.items()
+        )
+
     def __init__(self, client, loop=None):
         self.loop = loop or asyncio.get_event_loop()
         self.client = client
 
-        # "name": {"dict_key": "id", "type": str}
-        self.required = {}
-        self.optional = {}
-
     def _get_proper_obj(self, obj, t):
         if type(obj) is not t:
             if t is not dict and t is not list:
@@ -21,57 +62,142 @@ class BaseObject:
     def _assign(self, obj):
         logging.debug("Created %s object" % self.__class__.__name__)
 
-        self._object_integrety(obj)
         self.raw = obj
 
-        for key in self.required:
-            myobj = self._get_proper_obj(
-                obj[self.required[key]["dict_key"]],
-                self.required[key]["type"]
-            )
+        # Lazy objects only keep raw, fields are decoded by __getattr__
+        if getattr(self.client, "lazy_objects", False):
+            if not obj.keys() >= self._required_keys:
+                self._object_integrety(obj)
+        else:
+            self._assign_fields(obj, self._required_fields, self._optional_fields)
 
-            setattr(
-                self,
-                key,
-                myobj
-            )
+        if hasattr(type(self), "__cinit__") and self._should_cache():
+            self._start_caching()
 
-        for key in self.optional:
-            if self.optional[key]["dict_key"] in obj:
-                setattr(
-                    self,
-                    key,
-                    self._get_proper_obj(
-                        obj[self.optional[key]["dict_key"]],
-                        self.optional[key]["type"]
-                    )
-                )
+    def _should_cache(self):
+        # Whether _assign should start __cinit__ for this object
+        return True
+
+    def _start_caching(self):
+        # Runs __cinit__ in the background, replacing any caching
+        #   already running as far as caching_finished is concerned
+        self.caching_finished = False
+        self.cache_task = self.loop.create_task(self.__cinit__())
+        self.cache_task.add_done_callback(self._cache_done)
+
+        registry = getattr(self.client, "cache_tasks", None)
+        if registry is not None:
+            registry.add(self.cache_task)
+
+    def _assign_fields(self, obj, required, optional):
+        attrs = self.__dict__
+
+        try:
+            for name, key, t in required:
+                value = obj[key]
+                if t is not None and type(value) is not t:
+                    value = t(value)
+
+                attrs[name] = value
+        except KeyError:
+            self._object_integrety(obj, required)
+            raise
+
+        for name, key, t in optional:
+            if key in obj:
+                value = obj[key]
+                if t is not None and type(value) is not t:
+                    value = t(value)
+
+                attrs[name] = value
+            else:
+                attrs[name] = None
+
+    def __getattr__(self, name):
+        # Only called for names not set yet, so this is a lazy field
+        #   being read for the first time (or a missing attribute)
+        field = type(self)._lazy_fields.get(name)
+        raw = self.__dict__.get("raw")
+
+        if field is None or raw is None:
+            raise AttributeError("'%s' object has no attribute '%s'" % (
+                self.__class__.__name__, name))
+
+        key, t = field
+        if key in raw:
+            value = raw[key]
+            if t is not None and type(value) is not t:
+                value = t(value)
+        else:
+            value = None
+
+        self.__dict__[name] = value
+        return value
+
+    def _refresh(self, obj, cls=None):
+        # Updates this object in place from a new payload of the same entity
+        # cls is the class the payload was fetched as, this object is
+        #   upgraded to it if it's a subclass (LimitedUser to User) and
+        #   keeps the fields the payload lacks if it isn't
+        target = type(self)
+        if cls is not None and cls is not target:
+            if issubclass(cls, target):
+                target = cls
             else:
-                setattr(self, key, None)
+                obj = dict(self.raw, **obj)
 
-        if hasattr(self, "__cinit__"):
-            self.caching_finished = False
-            self.cache_task = self.loop.create_task(self.__cinit__())
+        # Check before changing anything, this object is shared and a bad
+        #   payload mustn't leave it half updated
+        if not obj.keys() >= target._required_keys:
+            self._object_integrety(obj, target._required_fields)
 
-        # Save yo memory fool
-        del self.required
-        del self.optional
+        self.__class__ = target
 
-    def _object_integrety(self, obj):
-        for key in self.required:
-            if self.required[key]["dict_key"] not in obj:
+        if getattr(self.client, "lazy_objects", False):
+            for name in self._lazy_fields:
+                self.__dict__.pop(name, None)
+        else:
+            self._assign_fields(obj, self._required_fields, self._optional_fields)
+
+        self.raw = obj
+
+    def _patch(self, changes):
+        # Updates fields in place from a partial payload keyed like
+        #   the api payload, {"location": "offline"}
+        self.raw = dict(self.raw, **changes)
+        attrs = self.__dict__
+
+        for name, key, t in self._required_fields + self._optional_fields:
+            if key in changes:
+                value = changes[key]
+                if t is not None and type(value) is not t:
+                    value = t(value)
+
+                attrs[name] = value
+
+    def _object_integrety(self, obj, required=None):
+        for name, key, t in required or self._required_fields:
+            if key not in obj:
                 print(obj.keys())
                 raise ObjectErrors.IntegretyError(
                     "{} object missing required key {}".format(
-                        self.__class__.__name__, self.required[key]["dict_key"]
+                        self.__class__.__name__, key
                     )
                 )
 
-    async def wait_for_cache(self):
+    def _cache_done(self, task):
+        if task is self.cache_task:
+            self.caching_finished = True
+
+    async def wait_for_cache(self, timeout=None):
         '''
         Waits for any caching an object has to do
+        Raises whatever the caching raised, or asyncio.TimeoutError
+        if timeout runs out (caching keeps going)
+
+            timeout, int
+            Seconds to wait, None to wait forever
         '''
 
         if hasattr(self, "cache_task"):
-            while not self.caching_finished:
-                await asyncio.sleep(0.1)
+            await asyncio.wait_for(asyncio.shield(self.cache_task), timeout)
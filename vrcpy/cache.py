@@ -0,0 +1,380 @@
+import time
+import asyncio
+import logging
+
+from collections import OrderedDict
+
+class FriendCache:
+    '''
+    Cache of friend objects keyed by user id
+    May hold LimitedUser or User objects
+
+    Behaves like a sequence (len, iteration, indexing, append,
+    remove, "in") so older code treating client.friends as a list still works
+    '''
+
+    # "index_name": "attribute"
+    indexes = {
+        "location": "location",
+        "status": "status",
+        "world_id": "world_id"
+    }
+
+    def __init__(self, users=None):
+        self._users = {}
+
+        # Secondary indexes, {"index_name": {value: {id: user}}}
+        self._indexes = {name: {} for name in self.indexes}
+
+        # Index values each user was filed under, so an entry can be
+        # unfiled even if the object was changed in place since
+        self._keys = {}
+
+        # Tuple of the cached objects for iteration/indexing, rebuilt
+        #   only after the cache changed
+        self._values = None
+
+        if users is not None:
+            for user in users:
+                self.put(user)
+
+    def __len__(self):
+        return len(self._users)
+
+    def _snapshot(self):
+        if self._values is None:
+            self._values = tuple(self._users.values())
+
+        return self._values
+
+    def __iter__(self):
+        # Over a snapshot, so the cache can change while iterating
+        return iter(self._snapshot())
+
+    def __contains__(self, user):
+        if isinstance(user, str):
+            return user in self._users
+
+        return self._users.get(getattr(user, "id", None)) is user
+
+    def __getitem__(self, index):
+        return self._snapshot()[index]
+
+    def __bool__(self):
+        return bool(self._users)
+
+    def __repr__(self):
+        return "<FriendCache (%s friends)>" % len(self._users)
+
+    def _index(self, user):
+        keys = {}
+
+        for name, attr in self.indexes.items():
+            value = getattr(user, attr, None)
+            keys[name] = value
+
+            self._indexes[name].setdefault(value, {})[user.id] = user
+
+        self._keys[user.id] = keys
+
+    def _unindex(self, id):
+        keys = self._keys.pop(id, None)
+        if keys is None:
+            return
+
+        for name, value in keys.items():
+            bucket = self._indexes[name].get(value)
+            if bucket is None:
+                continue
+
+            bucket.pop(id, None)
+            if not bucket:
+                del self._indexes[name][value]
+
+    def get(self, id, default=None):
+        '''
+        Gets a cached friend
+
+            id, str
+            ID of the user to get
+        '''
+
+        return self._users.get(id, default)
+
+    def put(self, user):
+        '''
+        Adds or replaces a friend in place
+        Returns the previously cached object or None
+
+        Call this again with the same object after changing it in place
+        to refresh the secondary indexes
+
+            user, LimitedUser
+            User to cache
+        '''
+
+        old = self._users.get(user.id)
+        self._unindex(user.id)
+
+        if old is not user:
+            self._values = None
+
+        self._users[user.id] = user
+        self._index(user)
+
+        return old
+
+    def append(self, user):
+        # List compatibility
+        self.put(user)
+
+    def remove(self, user):
+        '''
+        Removes a friend
+        Raises ValueError if not cached, like list.remove
+
+            user, LimitedUser or str
+            User or ID of the user to remove
+        '''
+
+        if self.pop(getattr(user, "id", user)) is None:
+            raise ValueError("%s is not a cached friend" % user)
+
+    def pop(self, id, default=None):
+        '''
+        Removes a friend by id
+        Returns the removed object or default
+
+            id, str
+            ID of the user to remove
+        '''
+
+        if id not in self._users:
+            return default
+
+        self._unindex(id)
+        self._values = None
+        return self._users.pop(id)
+
+    def clear(self):
+        self._users.clear()
+        self._values = None
+        self._keys.clear()
+
+        for index in self._indexes.values():
+            index.clear()
+
+    def ids(self):
+        return list(self._users)
+
+    def by_location(self, location):
+        '''
+        Returns list of cached friends at a location
+
+            location, str
+            Location string (worldId:instanceId, "private", "offline")
+        '''
+
+        return list(self._indexes["location"].get(location, {}).values())
+
+    def by_status(self, status):
+        '''
+        Returns list of cached friends with a status
+
+            status, str
+            Status to filter by ("active", "join me", "busy", ...)
+        '''
+
+        return list(self._indexes["status"].get(status, {}).values())
+
+    def by_world(self, world_id):
+        '''
+        Returns list of cached friends in a world
+        Only User objects carry a world id
+
+            world_id, str
+            ID of the world
+        '''
+
+        return list(self._indexes["world_id"].get(world_id, {}).values())
+
+class CacheTaskRegistry:
+    '''
+    Tracks the background caching tasks (__cinit__) objects start
+    so they can be awaited or cancelled all at once
+    '''
+
+    def __init__(self):
+        self.tasks = set()
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def add(self, task):
+        self.tasks.add(task)
+        task.add_done_callback(self._done)
+
+    def _done(self, task):
+        self.tasks.discard(task)
+
+        if not task.cancelled() and task.exception() is not None:
+            logging.error("Object caching failed (%s)" % repr(task.exception()))
+
+    async def wait(self, timeout=None):
+        '''
+        Waits for all outstanding caching
+        Raises the first exception a caching task raised, or
+        asyncio.TimeoutError if timeout runs out (tasks keep running)
+
+            timeout, int
+            Seconds to wait, None to wait forever
+        '''
+
+        if not self.tasks:
+            return
+
+        done, pending = await asyncio.wait(list(self.tasks), timeout=timeout)
+
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+        if pending:
+            raise asyncio.TimeoutError("%s caching tasks still running" % len(pending))
+
+    def cancel(self):
+        '''
+        Cancels all outstanding caching
+        '''
+
+        for task in list(self.tasks):
+            task.cancel()
+
+class ResponseCache:
+    '''
+    TTL + LRU cache of GET responses, bounded by entry count and size
+    Only endpoints with a TTL are cached
+    '''
+
+    default_ttls = {
+        "/users/{id}": 30,
+        "/worlds/{id}": 300,
+        "/worlds/{id}/{id}": 15
+    }
+
+    def __init__(self, ttls=None, max_entries=1000, max_bytes=16 * 1024 * 1024):
+        '''
+            ttls, dict
+            {"/normalised/{id}/path": seconds}, see request.normalize_path
+
+            max_entries, int
+            Max responses kept
+
+            max_bytes, int
+            Max total size of kept response bodies
+        '''
+
+        self.ttls = self.default_ttls if ttls is None else ttls
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # {key: entry}, least recently used first
+        self.entries = OrderedDict()
+        # {path: set of keys} for invalidation
+        self._paths = {}
+
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def ttl(self, endpoint):
+        return self.ttls.get(endpoint)
+
+    def get(self, key):
+        '''
+        Returns cache entry dict or None, may be stale
+            "response", the cached Request.call return
+            "etag", ETag header or None
+            "expires", time.monotonic() it goes stale at
+        '''
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+
+        return entry
+
+    def fresh(self, entry):
+        return entry["expires"] > time.monotonic()
+
+    def put(self, key, path, response, ttl, size, etag=None):
+        self._drop(key)
+
+        self.entries[key] = {
+            "path": path,
+            "response": response,
+            "etag": etag,
+            "expires": time.monotonic() + ttl,
+            "ttl": ttl,
+            "size": size
+        }
+
+        self._paths.setdefault(path, set()).add(key)
+        self.size += size
+
+        while self.entries and (len(self.entries) > self.max_entries
+            or self.size > self.max_bytes):
+
+            self._drop(next(iter(self.entries)))
+            self.evictions += 1
+
+    def refresh(self, entry):
+        # Server said 304 Not Modified
+        entry["expires"] = time.monotonic() + entry["ttl"]
+        self.revalidated += 1
+
+    def invalidate(self, path):
+        '''
+        Drops every cached response of a path
+
+            path, str
+            Path like "/users/usr_x"
+        '''
+
+        for key in list(self._paths.get(path, ())):
+            self._drop(key)
+            self.invalidations += 1
+
+    def clear(self):
+        self.entries.clear()
+        self._paths.clear()
+        self.size = 0
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+
+        self.size -= entry["size"]
+
+        keys = self._paths[entry["path"]]
+        keys.discard(key)
+        if not keys:
+            del self._paths[entry["path"]]
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
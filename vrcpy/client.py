@@ -1,5 +1,11 @@
 from vrcpy.request import Request
 from vrcpy.errors import ClientErrors
+from vrcpy.cache import FriendCache, CacheTaskRegistry
+from vrcpy.ratelimit import Priority
+from vrcpy.dispatch import EventDispatcher, Backpressure
+from vrcpy.codec import get_codec
+from vrcpy.paginator import Paginator
+from vrcpy.snapshot import dump_snapshot, write_snapshot, read_snapshot, apply_snapshot
 
 from vrcpy.user import *
 from vrcpy.world import *
@@ -7,11 +13,15 @@ from vrcpy.notification import *
 from vrcpy.favorite import BaseFavorite
 from vrcpy.permission import BasePermission
 from vrcpy.file import FileBase
+from vrcpy.avatar import Avatar
 
 import logging
 import asyncio
+import aiohttp
+import weakref
 import base64
-import json
+import time
+import copy
 
 class Client:
     # Refs to avoid circular imports
@@ -25,20 +35,128 @@ class Client:
     _FriendRequestNotification = FriendRequestNotification
     _BaseFavorite = BaseFavorite
 
-    def __init__(self, loop=None, verify=True):
-        self.request = Request(verify=verify)
+    # Users we have to fetch for ws events are gathered for this many
+    #   seconds, then fetched together (each id once)
+    user_fetch_window = 0.1
+    user_fetch_concurrency = 5
+
+    def __init__(self, loop=None, verify=True, lazy_objects=False,
+        hydrate_instances=False, instance_cache_ttl=60, dispatch_workers=8,
+        dispatch_queue_size=1000, backpressure=Backpressure.block, coalesce_window=0,
+        codec=None, pipeline_url="wss://pipeline.vrchat.cloud/", recorder=None,
+        snapshot_path=None, snapshot_interval=300, snapshot_max_age=86400,
+        **request_options):
+        '''
+            lazy_objects, bool
+            Objects keep the raw payload and only decode a field
+            the first time it's read
+
+            hydrate_instances, bool
+            Fetch every instance of a World as soon as it's made
+            Otherwise call World.fetch_instances when needed
+
+            instance_cache_ttl, int
+            Seconds a fetched Instance is reused for
+
+            dispatch_workers, int
+            Number of tasks running ws event handlers
+
+            dispatch_queue_size, int
+            Max ws events waiting for a handler
+
+            backpressure, str
+            What to do with new ws events when the queue is full
+            See vrcpy.dispatch.Backpressure
+
+            coalesce_window, int/float
+            Seconds to gather a friend's friend-location/friend-update
+            events, only the latest of each gets handled, 0 to disable
+
+            codec, class
+            Decodes ws frames, see vrcpy.codec (defaults to orjson
+            if installed, else json)
+
+            pipeline_url, str
+            Websocket to get events from, see also base_url
+
+            recorder, PipelineRecorder
+            Records every pipeline frame, see vrcpy.recorder
+
+            snapshot_path, str
+            File to keep a snapshot of me, friends, worlds and instances
+            in, loaded on login so friends are served straight away
+            (then refreshed in the background, see warm and
+            reconcile_error), saved every snapshot_interval seconds and
+            on logout, None to disable
+
+            snapshot_interval, int
+            Seconds between snapshots while connected, 0 for only on logout
+
+            snapshot_max_age, int
+            Seconds after which a snapshot is too old to load
+
+        request_options are passed to Request, for the api url
+        (base_url), connection pool tuning (pool_size,
+        pool_size_per_host, keepalive_timeout, dns_cache_ttl),
+        deadlines (connect_timeout, first_byte_timeout, total_timeout,
+        or timeout as an aiohttp.ClientTimeout), pacing (scheduler, a
+        vrcpy.ratelimit.RequestScheduler, the default one doesn't pace
+        requests and only pauses them after a 429), instrumentation
+        (hooks, see vrcpy.metrics) or sharing (connector, config),
+        see ClientPool
+        '''
+
+        self.request = Request(loop=loop, verify=verify, **request_options)
+        self.lazy_objects = lazy_objects
+        self.codec = codec or get_codec()
+        self.pipeline_url = pipeline_url
+        self.recorder = recorder
+        self.hydrate_instances = hydrate_instances
+
+        # One live object per user/world/instance/avatar, see _canonical
+        # _event_seq counts friend events, _user_events holds the count
+        #   at the last one about each user, so fetch results older
+        #   than an event don't undo it
+        self._event_seq = 0
+        self._user_events = {}
+        self._identity = weakref.WeakValueDictionary()
+
+        # Caching tasks objects started, see wait_for_caching
+        self.cache_tasks = CacheTaskRegistry()
+
+        # {(world_id, instance_id): (expires, Instance)}
+        self.instance_cache_ttl = instance_cache_ttl
+        self._instance_cache = {}
 
         self.me = None
 
         '''
-        This is a list of LimitedUser objects
-        It slowly gets made a list of User objects via ws events
+        This is a FriendCache of LimitedUser objects
+        It slowly gets made a cache of User objects via ws events
         You can force all User objects from the start using
             await client.upgrade_friends()
         In "on_connect" event or after
         '''
 
-        self.friends = []
+        self.friends = FriendCache()
+
+        # Warm start, see load_snapshot
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_max_age = snapshot_max_age
+        # warm is True while friends are snapshot data not yet refreshed
+        # reconcile_error is the last error refreshing them, None if the
+        #   last try worked (it's retried until it does or logout)
+        self.warm = False
+        self.reconcile_task = None
+        self.reconcile_error = None
+        self._snapshot_task = None
+        # Worlds/instances from the snapshot, _identity only holds them weakly
+        self._warm_objects = []
+
+        # {user id: future} of users waiting to be or being fetched
+        self._user_fetches = {}
+        self._user_batch = []
 
         self.ws = None
         self.loop = loop or asyncio.get_event_loop()
@@ -46,32 +164,215 @@ class Client:
         if loop is not None:
             asyncio.set_event_loop(loop)
 
+        self.event_handlers = {
+            "friend-location": self._on_friend_location,
+            "friend-online": self._on_friend_online,
+            "friend-offline": self._on_friend_offline,
+            "friend-active": self._on_friend_active,
+            "friend-add": self._on_friend_add,
+            "friend-delete": self._on_friend_delete,
+            "friend-update": self._on_friend_update,
+            "notification": self._on_notification
+        }
+
+        # Runs event_handlers, events of one user are handled in order
+        self.dispatcher = EventDispatcher(
+            self.event_handlers,
+            workers=dispatch_workers,
+            queue_size=dispatch_queue_size,
+            backpressure=backpressure,
+            coalesce_window=coalesce_window,
+            loop=self.loop
+        )
+
     async def _ws_loop(self):
-        self.friends = await self.me.fetch_friends()
+        if self.warm and self.friends:
+            # Serve snapshot friends now, fetch fresh ones in the background
+            self.reconcile_task = self.loop.create_task(self._reconcile_friends())
+        else:
+            self.friends = FriendCache(await self.me.fetch_friends())
+            self.warm = False
+
         self.loop.create_task(self.on_connect())
 
-        async for message in self.ws:
-            message = message.json()
-            content = json.loads(message["content"])
+        self.dispatcher.start()
 
-            logging.debug("Got ws message (%s)" % message["type"] )
+        if self.snapshot_path is not None and self.snapshot_interval:
+            self._snapshot_task = self.loop.create_task(self._snapshot_loop())
 
-            switch = {
-                "friend-location": self._on_friend_location,
-                "friend-online": self._on_friend_online,
-                "friend-offline": self._on_friend_offline,
-                "friend-active": self._on_friend_active,
-                "friend-add": self._on_friend_add,
-                "friend-delete": self._on_friend_delete,
-                "friend-update": self._on_friend_update,
-                "notification": self._on_notification
-            }
+        try:
+            async for message in self.ws:
+                if message.type not in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                    continue
 
-            if message["type"] in switch:
-                self.loop.create_task(switch[message["type"]](content))
+                if self.recorder is not None:
+                    self.recorder.record(message.data)
+
+                await self._on_frame(message.data)
+        finally:
+            await self.dispatcher.stop()
+
+            if self._snapshot_task is not None:
+                self._snapshot_task.cancel()
+                self._snapshot_task = None
+
+            if self.recorder is not None:
+                self.recorder.flush()
 
         self.loop.create_task(self.on_disconnect())
 
+    async def _on_frame(self, data):
+        message = self.codec.loads(data)
+
+        logging.debug("Got ws message (%s)" % message["type"])
+
+        # Don't bother decoding content of events we don't handle
+        if message["type"] not in self.event_handlers:
+            return
+
+        # content is json in a string, so needs its own decode
+        content = self.codec.loads(message["content"])
+
+        # Cached /users/{id} response of this friend is now stale, and so
+        #   is what we have of the instances they left and joined
+        if message["type"].startswith("friend-"):
+            id = EventDispatcher.key(content)
+            self.request.cache.invalidate("/users/%s" % id)
+
+            self._event_seq += 1
+            self._user_events[id] = self._event_seq
+
+            friend = self.friends.get(id)
+            if friend is not None:
+                self._invalidate_location(getattr(friend, "location", None))
+
+            location = content.get("location")
+            if location is None and isinstance(content.get("user"), dict):
+                location = content["user"].get("location")
+
+            self._invalidate_location(location)
+
+        await self.dispatcher.put(message["type"], content)
+
+    def _invalidate_location(self, location):
+        # Drops cached responses/objects of the instance at a location
+        #   ("wrld_x:12345~..."), occupancy changed
+        if not isinstance(location, str) or ":" not in location:
+            return
+
+        key = tuple(location.split(":", 1))
+
+        self.request.cache.invalidate("/worlds/%s/%s" % key)
+        self._instance_cache.pop(key, None)
+
+    # Snapshot
+
+    def load_snapshot(self, path=None):
+        '''
+        Fills me, friends, worlds and instances from a snapshot
+        Returns if a snapshot was loaded
+        Done by login when snapshot_path is set
+
+            path, str
+            Snapshot file, None for snapshot_path
+        '''
+
+        path = path or self.snapshot_path
+        start = time.perf_counter()
+
+        data = read_snapshot(path, self.snapshot_max_age)
+        if data is None:
+            return False
+
+        self._warm_objects = apply_snapshot(self, data)
+        self.warm = True
+
+        logging.info("Loaded snapshot %s (%s friends) in %.1fms" % (
+            path, len(self.friends), (time.perf_counter() - start) * 1000))
+
+        return True
+
+    async def save_snapshot(self, path=None):
+        '''
+        Saves me, friends, worlds and instances to a snapshot
+        Done every snapshot_interval and on logout when snapshot_path is set
+
+            path, str
+            Snapshot file, None for snapshot_path
+        '''
+
+        path = path or self.snapshot_path
+        data = dump_snapshot(self)
+
+        # Payloads are replaced, never changed in place, so encoding off
+        #   the loop is safe
+        await self.loop.run_in_executor(None, write_snapshot, path, data)
+
+        logging.debug("Saved snapshot %s" % path)
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+
+            # Same as logout, wait until friends are reconciled
+            if self.warm:
+                continue
+
+            try:
+                await self.save_snapshot()
+            except Exception:
+                logging.exception("Couldn't save snapshot")
+
+    def _discard_snapshot(self):
+        if self.reconcile_task is not None:
+            self.reconcile_task.cancel()
+            self.reconcile_task = None
+
+        self.friends.clear()
+        self._warm_objects = []
+        self.warm = False
+        self.reconcile_error = None
+
+    async def _reconcile_friends(self):
+        # Brings snapshot friends up to date, dropping ones we lost
+        # Friends that ws events touched meanwhile are left alone, the
+        #   events are newer than the list we fetched
+        attempt = 0
+
+        while True:
+            since = self._event_seq
+
+            try:
+                fresh = await self.me._fetch_friend_payloads()
+                break
+            except Exception as e:
+                self.reconcile_error = e
+
+                delay = self.request.retry_policy.delay(attempt)
+                attempt += 1
+
+                logging.warning("Couldn't refresh snapshot friends (%s), retrying in %.1fs" % (
+                    repr(e), delay))
+
+                await asyncio.sleep(delay)
+
+        self.reconcile_error = None
+        touched = self._touched_since(since)
+
+        ids = set()
+        for user in fresh:
+            ids.add(user["id"])
+
+            if user["id"] not in touched:
+                self.friends.put(self._canonical(User, user))
+
+        for id in set(self.friends.ids()) - ids - touched:
+            self.friends.pop(id)
+
+        self.warm = False
+
+        logging.info("Refreshed snapshot friends (%s)" % len(self.friends))
+
     # Utility
 
     def get_friend(self, id):
@@ -83,43 +384,182 @@ class Client:
             ID of the user to get
         '''
 
-        logging.info("Getting cached friend with id " + id)
+        logging.debug("Getting cached friend with id " + id)
 
-        for user in self.friends:
-            if user.id == id:
-                return user
+        return self.friends.get(id)
 
-        return None
+    async def wait_for_caching(self, timeout=None):
+        '''
+        Waits for every object's outstanding caching
+        Raises the first caching exception, or asyncio.TimeoutError
 
-    async def fetch_user_via_id(self, id):
+            timeout, int
+            Seconds to wait, None to wait forever
+        '''
+
+        await self.cache_tasks.wait(timeout)
+
+    def cancel_caching(self):
+        '''
+        Cancels every object's outstanding caching
+        '''
+
+        self.cache_tasks.cancel()
+
+    async def fetch_user_via_id(self, id, priority=Priority.interactive):
         '''
         Gets a non-cached friend
         Returns a User object
 
             id, str
             ID of the user to get
+
+            priority, int
+            Request priority lane, see vrcpy.ratelimit.Priority
         '''
 
         logging.info("Getting user via id " + id)
 
-        user = await self.request.call("/users/" + id)
-        return User(self, user["data"], loop=self.loop)
+        since = self._event_seq
+
+        user = await self.request.call("/users/" + id, priority=priority)
+        return self._canonical(User, user["data"], since)
+
+    def _canonical(self, cls, obj, since=None):
+        '''
+        Returns the live object for the entity obj describes, refreshed
+        in place with obj, or a new cls object if there isn't one
+        Objects are only kept alive by whoever else references them
+
+            cls, BaseObject
+            Class to build obj as
+
+            obj, dict
+            Payload from the api
 
-    async def fetch_instance_via_id(self, world_id, instance_id):
+            since, int
+            _event_seq when the request for obj went out, a live user
+            a ws event updated after that isn't refreshed (obj is older)
+        '''
+
+        key = (cls._identity_kind, obj.get(cls._identity_key))
+        if key[0] is None or key[1] is None:
+            return cls(self, obj, self.loop)
+
+        current = self._identity.get(key)
+
+        if current is None:
+            current = cls(self, obj, self.loop)
+            self._identity[key] = current
+        elif since is not None and key[0] == "user" and self._user_events.get(key[1], 0) > since:
+            logging.debug("Not refreshing %s with an older payload" % key[1])
+        else:
+            current._refresh(obj, cls)
+
+            # Keep friend cache indexes in step with the refreshed object
+            if current in self.friends:
+                self.friends.put(current)
+
+        return current
+
+    def _touched_since(self, since):
+        # Returns set of user ids ws events were about after _event_seq since
+        return {id for id, seq in self._user_events.items() if seq > since}
+
+    def _fetch_user_later(self, id):
+        # Returns a future for the user, fetched with the next batch
+        # Shared by every handler waiting on the id, await it shielded
+        future = self._user_fetches.get(id)
+        if future is not None:
+            return future
+
+        future = self.loop.create_future()
+        self._user_fetches[id] = future
+        self._user_batch.append(id)
+
+        if len(self._user_batch) == 1:
+            self.loop.call_later(
+                self.user_fetch_window,
+                lambda: self.loop.create_task(self._fetch_user_batch())
+            )
+
+        return future
+
+    async def _fetch_user_batch(self):
+        batch, self._user_batch = self._user_batch, []
+        semaphore = asyncio.Semaphore(self.user_fetch_concurrency)
+
+        logging.debug("Fetching batch of %s users" % len(batch))
+
+        async def fetch(id):
+            future = self._user_fetches[id]
+
+            try:
+                async with semaphore:
+                    user = await self.fetch_user_via_id(id, Priority.normal)
+
+                if not future.done():
+                    future.set_result(user)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                del self._user_fetches[id]
+
+        await asyncio.gather(*[fetch(id) for id in batch])
+
+    async def fetch_instance_via_id(self, world_id, instance_id, priority=Priority.normal):
         '''
         Gets instance object
+        Reuses a fetched instance for instance_cache_ttl seconds
 
             world_id, str
             ID of the world of the instance
 
             instance_id, str
             ID of the specific instance
+
+            priority, int
+            Request priority lane, see vrcpy.ratelimit.Priority
+        '''
+
+        key = (world_id, instance_id)
+        cached = self._instance_cache.get(key)
+
+        if cached is not None and cached[0] > self.loop.time():
+            logging.debug("Getting cached instance %s:%s" % key)
+            return cached[1]
+
+        logging.info("Getting instance %s:%s" % key)
+
+        instance = await self.request.call("/worlds/%s/%s" % key, priority=priority)
+        instance = self._canonical(Instance, instance["data"])
+
+        self._cache_instance(key, instance)
+        return instance
+
+    def _cache_instance(self, key, instance):
+        now = self.loop.time()
+
+        # Drop expired entries every so often so this can't grow forever
+        if len(self._instance_cache) >= 1000:
+            for old in [k for k, v in self._instance_cache.items() if v[0] <= now]:
+                del self._instance_cache[old]
+
+        self._instance_cache[key] = (now + self.instance_cache_ttl, instance)
+
+    async def fetch_avatar_via_id(self, id):
+        '''
+        Gets avatar object
+
+            id, str
+            ID of the avatar to get
         '''
 
-        logging.info("Getting instance %s:%s" % (world_id, instance_id))
+        logging.info("Getting avatar via id " + id)
 
-        instance = await self.request.call("/worlds/%s/%s" % (world_id, instance_id))
-        return Instance(self, instance["data"], self.loop)
+        avatar = await self.request.call("/avatars/" + id)
+        return self._canonical(Avatar, avatar["data"])
 
     async def fetch_permissions(self, condensed=False):
         '''
@@ -140,6 +580,35 @@ class Client:
             perms = await self.request.call("/auth/permissions")
             return [BasePermission.build_permission(self, perm, self.loop) for perm in perms["data"]]
 
+    def iter_files(self, tag=None, page_size=100, limit=None, prefetch=True):
+        '''
+        Returns a Paginator of FileBase/IconFile objects
+
+            async for file in client.iter_files(tag="icon"):
+                ...
+
+            tag, str
+            Tag to filter files
+
+            page_size, int
+            Files requested per page
+
+            limit, int
+            Max files to yield, None for all of them
+
+            prefetch, bool
+            Fetch the next page while the current one is consumed
+        '''
+
+        params = {}
+        if tag is not None:
+            params["tag"] = tag
+
+        return Paginator(
+            self, "/files", lambda obj: FileBase.build_file(self, obj, self.loop),
+            params=params, page_size=page_size, limit=limit, prefetch=prefetch
+        )
+
     async def get_files(self, tag=None, n=100):
         '''
         Gets user icons
@@ -149,32 +618,145 @@ class Client:
             Tag to filter files
 
             n, int
-            Number of files to return (max might be 100?)
+            Number of files to return, fetched 100 a page
         '''
 
         logging.info("Getting files (tag is %s)" % tag)
 
-        params = {"n": n}
+        return await self.iter_files(tag=tag, limit=n).flatten()
+
+    def iter_favorites(self, type=None, tag=None, page_size=100, limit=None, prefetch=True):
+        '''
+        Returns a Paginator of WorldFavorite/FriendFavorite/AvatarFavorite objects
+
+            type, str
+            "world", "friend" or "avatar", None for all
+
+            tag, str
+            Favorite group to filter by
+
+            page_size, int
+            Favorites requested per page
+
+            limit, int
+            Max favorites to yield, None for all of them
+
+            prefetch, bool
+            Fetch the next page while the current one is consumed
+        '''
+
+        params = {}
+        if type is not None:
+            params["type"] = type
         if tag is not None:
-            params.update({"tag": tag})
+            params["tag"] = tag
+
+        return Paginator(
+            self, "/favorites", lambda obj: BaseFavorite.build_favorite(self, obj, self.loop),
+            params=params, page_size=page_size, limit=limit, prefetch=prefetch
+        )
+
+    def iter_notifications(self, type=Notification.Type.all, sent=False, hidden=False,
+        after=None, page_size=100, limit=None, prefetch=True):
+        '''
+        Returns a Paginator of notification objects
+
+            type, str
+            Notification type to get, see Notification.Type
+
+            sent, bool
+            Get notifications sent by us instead
+
+            hidden, bool
+            Include hidden notifications
+
+            after, str
+            Only get notifications created after this date
+
+            page_size, int
+            Notifications requested per page
 
-        files = await self.request.call("/files", params=params)
-        return [FileBase.build_file(self, file, self.loop) for file in files["data"]]
+            limit, int
+            Max notifications to yield, None for all of them
 
-    async def upgrade_friends(self):
+            prefetch, bool
+            Fetch the next page while the current one is consumed
+        '''
+
+        params = {"type": type, "sent": sent, "hidden": hidden}
+        if after is not None:
+            params["after"] = after
+
+        return Paginator(
+            self, "/auth/user/notifications",
+            lambda obj: BaseNotification.build_notification(self, obj, self.loop),
+            params=params, page_size=page_size, limit=limit, prefetch=prefetch
+        )
+
+    async def upgrade_friends(self, concurrency=5, callback=None):
         '''
         Forces all client.friends LimitedUser objects
         to become User objects
+        Each User replaces its LimitedUser in client.friends as it arrives
+
+        Returns dict of
+            "upgraded", list of User objects
+            "failed", dict of {user id: exception} for users that couldn't be fetched
+
+            concurrency, int
+            Max number of users to fetch at once
+
+            callback, function
+            Called as callback(done, total, user) after each user
+            user is None if it failed, may be a coroutine function
+
+        Fetches go out in the background priority lane, rate limits are
+        waited out and retried by the request scheduler/retry policy
         '''
 
-        friends = []
+        friends = list(self.friends)
+        result = {"upgraded": [], "failed": {}}
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def upgrade(friend):
+            async with semaphore:
+                logging.debug("Upgrading " + friend.display_name)
 
-        for friend in self.friends:
-            logging.debug("Upgrading " + friend.display_name)
-            friends.append(await friend.fetch_full())
+                since = self._event_seq
+                user = await friend.fetch_full(Priority.background)
 
-        self.friends = friends
-        logging.info("Finished upgrading friends")
+                # Only swap in if they weren't removed/replaced meanwhile,
+                #   and a ws event didn't make the fetched payload stale
+                if self.friends.get(friend.id) is friend \
+                    and self._user_events.get(friend.id, 0) <= since:
+                    self.friends.put(user)
+
+                return user
+
+        async def report(friend):
+            try:
+                user = await upgrade(friend)
+                result["upgraded"].append(user)
+            except Exception as e:
+                logging.warning("Failed to upgrade %s (%s)" % (friend.id, e))
+                result["failed"][friend.id] = e
+                user = None
+
+            if callback is not None:
+                ret = callback(
+                    len(result["upgraded"]) + len(result["failed"]),
+                    len(friends),
+                    user
+                )
+
+                if asyncio.iscoroutine(ret):
+                    await ret
+
+        await asyncio.gather(*[report(friend) for friend in friends])
+
+        logging.info("Finished upgrading friends (%s failed)" % len(result["failed"]))
+        return result
 
     # Main
 
@@ -225,6 +807,10 @@ class Client:
 
             b64 = base64.b64encode((username+":"+password).encode()).decode()
 
+        # Load before going to the api, so friends are there straight away
+        if self.snapshot_path is not None and not self.warm and not self.friends:
+            self.load_snapshot()
+
         resp = await self.request.call(
             "/auth/user",
             headers={"Authorization": "Basic " + b64},
@@ -245,6 +831,10 @@ class Client:
         if "requiresTwoFactorAuth" in resp["data"]:
             raise ClientErrors.MfaRequired("Account login requires 2fa")
 
+        if self.warm and self.me is not None and self.me.id != resp["data"]["id"]:
+            logging.warning("Snapshot is of another account, not using it")
+            self._discard_snapshot()
+
         self.me = CurrentUser(self, resp["data"], self.loop)
 
     async def login2fa(self, username=None, password=None, b64=None, mfa=None):
@@ -303,16 +893,31 @@ class Client:
 
         logging.info("Doing logout (%sdeauthing authtoken)" % ("" if unauth else "not "))
 
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+
+        # A snapshot mid-reconcile still has friends we may have lost,
+        #   better to keep the last good one
+        if self.snapshot_path is not None and self.me is not None and not self.warm:
+            try:
+                await self.save_snapshot()
+            except Exception:
+                logging.exception("Couldn't save snapshot")
+
         self.me = None
-        self.friends = None
+        self._discard_snapshot()
+        self._user_events.clear()
+        self.cancel_caching()
 
         if unauth:
             await self.request.call("/logout", "PUT")
-        await self.request.close_session()
 
         if self.ws is not None:
             await self.ws.close()
 
+        await self.request.close()
+
         await asyncio.sleep(0)
 
     def run(self, username=None, password=None, b64=None, mfa=None):
@@ -347,7 +952,7 @@ class Client:
             if cookie.key == "auth":
                 authToken = cookie.value.split(";")[0]
 
-        self.ws = await self.request.session.ws_connect("wss://pipeline.vrchat.cloud/?authToken="+authToken)
+        self.ws = await self.request.session.ws_connect(self.pipeline_url+"?authToken="+authToken)
         await self._ws_loop()
 
     async def event(self, func):
@@ -379,12 +984,8 @@ class Client:
         pass
 
     async def _on_friend_online(self, obj):
-        user = User(self, obj["user"], self.loop)
-        friend = self.get_friend(user.id)
-
-        if friend is not None:
-            self.friends.remove(friend)
-        self.friends.append(user)
+        user = self._canonical(User, obj["user"])
+        self.friends.put(user)
 
         await self.on_friend_online(user)
 
@@ -393,12 +994,14 @@ class Client:
         pass
 
     async def _on_friend_offline(self, obj):
-        user = await self.fetch_user_via_id(obj["userId"])
-        friend = self.get_friend(user.id)
+        user = self.friends.get(obj["userId"])
+
+        if user is None:
+            user = await asyncio.shield(self._fetch_user_later(obj["userId"]))
+        else:
+            user._patch({"location": "offline", "state": "offline"})
 
-        if friend is not None:
-            self.friends.remove(friend)
-        self.friends.append(user)
+        self.friends.put(user)
 
         await self.on_friend_offline(user)
 
@@ -407,12 +1010,8 @@ class Client:
         pass
 
     async def _on_friend_active(self, obj):
-        user = User(self, obj["user"], self.loop)
-        friend = self.get_friend(user.id)
-
-        if friend is not None:
-            self.friends.remove(friend)
-        self.friends.append(user)
+        user = self._canonical(User, obj["user"])
+        self.friends.put(user)
 
         await self.on_friend_active(user)
 
@@ -421,12 +1020,8 @@ class Client:
         pass
 
     async def _on_friend_add(self, obj):
-        user = User(self, obj["user"], self.loop)
-        friend = self.get_friend(user.id)
-
-        if friend is not None:
-            self.friends.remove(friend)
-        self.friends.append(user)
+        user = self._canonical(User, obj["user"])
+        self.friends.put(user)
 
         await self.on_friend_add(user)
 
@@ -435,11 +1030,12 @@ class Client:
         pass
 
     async def _on_friend_delete(self, obj):
-        user = await self.fetch_user_via_id(obj["userId"])
-        friend = self.get_friend(user.id)
+        user = self.friends.pop(obj["userId"])
 
-        if friend is not None:
-            self.friends.remove(friend)
+        if user is None:
+            user = await asyncio.shield(self._fetch_user_later(obj["userId"]))
+        else:
+            user._patch({"isFriend": False})
 
         await self.on_friend_delete(user)
 
@@ -448,12 +1044,13 @@ class Client:
         pass
 
     async def _on_friend_update(self, obj):
-        user = User(self, obj["user"], self.loop)
-        ouser = self.get_friend(user.id)
-
+        # Snapshot, as user is refreshed in place
+        ouser = self.friends.get(obj["user"]["id"])
         if ouser is not None:
-            self.friends.remove(ouser)
-        self.friends.append(user)
+            ouser = copy.copy(ouser)
+
+        user = self._canonical(User, obj["user"])
+        self.friends.put(user)
 
         await self.on_friend_update(ouser, user)
 
@@ -470,12 +1067,13 @@ class Client:
         pass
 
     async def _on_friend_location(self, obj):
-        user = User(self, obj["user"], self.loop)
-        ouser = self.get_friend(user.id)
-
+        # Snapshot, as user is refreshed in place
+        ouser = self.friends.get(obj["user"]["id"])
         if ouser is not None:
-            self.friends.remove(ouser)
-        self.friends.append(user)
+            ouser = copy.copy(ouser)
+
+        user = self._canonical(User, obj["user"])
+        self.friends.put(user)
 
         await self.on_friend_location(ouser, user)
 
@@ -0,0 +1,53 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class JSONCodec:
+    # Stdlib json, always available
+
+    name = "json"
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj)
+
+class ORJSONCodec:
+    # orjson, used when installed (pip install orjson)
+
+    name = "orjson"
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return orjson.dumps(obj).decode()
+
+def get_codec(name=None):
+    '''
+    Returns a codec class with loads/dumps
+
+        name, str
+        "json" or "orjson", None for the fastest one installed
+    '''
+
+    if name is None:
+        return JSONCodec if orjson is None else ORJSONCodec
+
+    codecs = {
+        "json": JSONCodec,
+        "orjson": ORJSONCodec
+    }
+
+    if name == "orjson" and orjson is None:
+        raise ImportError("orjson codec requested but orjson isn't installed")
+
+    return codecs[name]
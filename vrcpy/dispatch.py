@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import itertools
+
+class Backpressure:
+    # What EventDispatcher.put does when a worker's queue is full
+
+    block = "block"             # Wait for room (slows down reading the ws)
+    drop_oldest = "drop_oldest" # Throw away the oldest queued event
+    coalesce = "coalesce"       # Replace the user's last queued event if it's the same type, else block
+
+class EventDispatcher:
+    '''
+    Runs ws event handlers on a fixed pool of workers with bounded queues
+    Events for the same user always go to the same worker, so they're
+    handled one at a time and in the order they arrived
+    '''
+
+    def __init__(self, handlers, workers=8, queue_size=1000,
+        backpressure=Backpressure.block, coalesce_window=0,
+        coalesce_events=("friend-location", "friend-update"), loop=None):
+        '''
+            handlers, dict
+            {"event type": coroutine function taking the event content}
+
+            workers, int
+            Number of worker tasks
+
+            queue_size, int
+            Max events queued across all workers
+
+            backpressure, str
+            What to do when a queue is full, see Backpressure
+
+            coalesce_window, int/float
+            Seconds to hold coalesce_events of a user, only the latest
+            one of each type in that time gets handled (in the order
+            they were last received), 0 to disable
+
+            coalesce_events, tuple
+            Event types coalesce_window applies to
+        '''
+
+        self.handlers = handlers
+        self.loop = loop or asyncio.get_event_loop()
+
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.backpressure = backpressure
+
+        self.queues = []
+        self.tasks = []
+
+        self.coalesce_window = coalesce_window
+        self.coalesce_events = coalesce_events
+
+        # {user id: their last queued entry} for coalescing, only that one
+        #   can be replaced without reordering the user's events
+        self._pending = {}
+
+        # {user id: {type: entry}} held by coalesce_window, one window
+        #   per user, entries ordered by when they were last replaced
+        self._held = {}
+        # {user id: future} of the user's last enqueue_in_order, done
+        #   once its events are queued, the next one waits for it
+        self._releasing = {}
+
+        self._round_robin = itertools.count()
+
+        self.processed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.window_coalesced = 0
+        self.errors = 0
+        self.lag_total = 0
+        self.lag_max = 0
+        self.lag_last = 0
+
+    @staticmethod
+    def key(content):
+        # User an event is about, None if it isn't about a user
+        if not isinstance(content, dict):
+            return None
+
+        if "userId" in content:
+            return content["userId"]
+        if isinstance(content.get("user"), dict):
+            return content["user"].get("id")
+
+        return content.get("senderUserId")
+
+    @property
+    def running(self):
+        return bool(self.tasks)
+
+    def start(self):
+        if self.running:
+            return
+
+        size = max(1, self.queue_size // self.workers)
+        self.queues = [asyncio.Queue(size) for _ in range(self.workers)]
+        self.tasks = [self.loop.create_task(self._work(queue)) for queue in self.queues]
+
+    async def stop(self, drain=True):
+        '''
+        Stops the workers
+
+            drain, bool
+            Handle everything already queued first
+        '''
+
+        if not self.running:
+            return
+
+        for key in list(self._held):
+            await self._release(key)
+
+        if drain:
+            for queue in self.queues:
+                await queue.put(None)
+        else:
+            for task in self.tasks:
+                task.cancel()
+
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+        self.tasks = []
+        self.queues = []
+        self._pending.clear()
+
+    async def put(self, type, content):
+        '''
+        Queues an event for its handler
+
+            type, str
+            Event type, must be in handlers
+
+            content, dict
+            Decoded event content
+        '''
+
+        key = self.key(content)
+
+        if self.coalesce_window and key is not None:
+            if type in self.coalesce_events:
+                self._hold(type, content, key)
+                return
+
+            # Held events of this user go first, in one go with this one
+            held = self._held.pop(key, None)
+            entries = list(held.values()) if held else []
+            entries.append([type, content, key, None])
+
+            await self._enqueue_in_order(key, entries)
+            return
+
+        await self._enqueue([type, content, key, None])
+
+    def _hold(self, type, content, key):
+        held = self._held.get(key)
+
+        if held is None:
+            held = self._held[key] = {}
+
+            self.loop.call_later(
+                self.coalesce_window,
+                lambda: self.loop.create_task(self._release(key, held))
+            )
+        elif type in held:
+            # Moved to the end, so it's handled after anything received
+            #   before it (a friend-update would otherwise undo a newer
+            #   friend-location)
+            del held[type]
+            self.window_coalesced += 1
+
+        held[type] = [type, content, key, None]
+
+    async def _release(self, key, held=None):
+        # held, only release that window (a timer of a window that was
+        #   already flushed mustn't cut the user's next one short)
+        if held is not None and self._held.get(key) is not held:
+            return
+
+        held = self._held.pop(key, None)
+        if held is None:
+            return
+
+        await self._enqueue_in_order(key, list(held.values()))
+
+    async def _enqueue_in_order(self, key, entries):
+        # Queues a user's entries after anything of theirs still waiting
+        #   for room in a full queue, so a timer's release and put() can't
+        #   interleave the user's events
+        previous = self._releasing.get(key)
+
+        done = self.loop.create_future()
+        self._releasing[key] = done
+
+        try:
+            if previous is not None:
+                await asyncio.shield(previous)
+
+            for entry in entries:
+                await self._enqueue(entry)
+        finally:
+            if self._releasing.get(key) is done:
+                del self._releasing[key]
+
+            done.set_result(None)
+
+    async def _enqueue(self, entry):
+        type, content, key = entry[:3]
+        entry[3] = self.loop.time()
+
+        if key is None:
+            queue = self.queues[next(self._round_robin) % self.workers]
+        else:
+            queue = self.queues[hash(key) % self.workers]
+
+        if queue.full():
+            if self.backpressure == Backpressure.drop_oldest:
+                dropped = queue.get_nowait()
+                queue.task_done()
+
+                self._unpend(dropped)
+                self.dropped += 1
+
+                logging.warning("Event queue full, dropped %s event" % dropped[0])
+
+            elif self.backpressure == Backpressure.coalesce and key is not None:
+                queued = self._pending.get(key)
+                if queued is not None and queued[0] == type:
+                    queued[1] = content
+                    self.coalesced += 1
+                    return
+
+        if key is not None:
+            self._pending[key] = entry
+
+        await queue.put(entry)
+
+    def _unpend(self, entry):
+        if entry is not None and self._pending.get(entry[2]) is entry:
+            del self._pending[entry[2]]
+
+    async def _work(self, queue):
+        while True:
+            entry = await queue.get()
+
+            try:
+                if entry is None:
+                    break
+
+                self._unpend(entry)
+
+                lag = self.loop.time() - entry[3]
+                self.lag_last = lag
+                self.lag_total += lag
+                self.lag_max = max(self.lag_max, lag)
+
+                await self.handlers[entry[0]](entry[1])
+            except Exception:
+                self.errors += 1
+                logging.exception("Error handling %s event" % entry[0])
+            finally:
+                if entry is not None:
+                    self.processed += 1
+                queue.task_done()
+
+    def stats(self):
+        '''
+        Returns dict of dispatcher stats for monitoring
+            "queued", total events waiting
+            "queue_depths", list of events waiting per worker
+            "processed", "dropped", "coalesced", "window_coalesced",
+                "errors", event counts
+            "held", events held by coalesce_window right now
+            "lag_avg", "lag_max", "lag_last", seconds from queueing
+                to the handler starting
+        '''
+
+        depths = [queue.qsize() for queue in self.queues]
+
+        return {
+            "queued": sum(depths),
+            "queue_depths": depths,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "window_coalesced": self.window_coalesced,
+            "held": sum(len(held) for held in self._held.values()),
+            "errors": self.errors,
+            "lag_avg": self.lag_total / self.processed if self.processed else 0,
+            "lag_max": self.lag_max,
+            "lag_last": self.lag_last
+        }
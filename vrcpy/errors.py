@@ -13,10 +13,22 @@ class RequestErrors:
         # Raised when all request retry attempts fail
         pass
 
+    class Timeout(RequestError):
+        # Raised when a request runs out of its total deadline
+        pass
+
     class RateLimit(Exception):
         # Raised when received a 429 http response
         pass
 
+    class ServerError(Exception):
+        # Raised when received a 5xx http response
+        pass
+
+    class InvalidApiKey(Exception):
+        # Raised when the apiKey sent with a request is rejected
+        pass
+
 class ClientErrors:
     # Errors for vrcpy/client.py
 
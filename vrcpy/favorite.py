@@ -3,24 +3,24 @@ from vrcpy.baseobject import BaseObject
 import logging
 
 class BaseFavorite(BaseObject):
+    required = {
+        "id": {
+            "dict_key": "id",
+            "type": str
+        },
+        "type": {
+            "dict_key": "type",
+            "type": str
+        }
+    }
+
     def __init__(self, client, obj, loop=None):
         super().__init__(client, loop)
 
-        self.required.update({
-            "id": {
-                "dict_key": "id",
-                "type": str
-            },
-            "type": {
-                "dict_key": "type",
-                "type": str
-            }
-        })
-
         self.favorite_group = obj["tags"][0]
 
     @staticmethod
-    def build_favorite(self, client, obj, loop=None):
+    def build_favorite(client, obj, loop=None):
         switch = {
             "world": WorldFavorite,
             "friend": FriendFavorite,
@@ -39,40 +39,40 @@ class BaseFavorite(BaseObject):
         await self.client.request.call("/favorites/"+self.id, "DELETE")
 
 class WorldFavorite(BaseFavorite):
+    required = {
+        "world_id": {
+            "dict_key": "favoriteId",
+            "type": str
+        }
+    }
+
     def __init__(self, client, obj, loop=None):
         super().__init__(client, obj, loop)
 
-        self.required.update({
-            "world_id": {
-                "dict_key": "favoriteId",
-                "type": str
-            }
-        })
-
         self._assign(obj)
 
 class AvatarFavorite(BaseFavorite):
+    required = {
+        "avatar_id": {
+            "dict_key": "favoriteId",
+            "type": str
+        }
+    }
+
     def __init__(self, client, obj, loop=None):
         super().__init__(client, obj, loop)
 
-        self.required.update({
-            "avatar_id": {
-                "dict_key": "favoriteId",
-                "type": str
-            }
-        })
-
         self._assign(obj)
 
 class FriendFavorite(BaseFavorite):
+    required = {
+        "user_id": {
+            "dict_key": "favoriteId",
+            "type": str
+        }
+    }
+
     def __init__(self, client, obj, loop=None):
         super().__init__(client, obj, loop)
 
-        self.required.update({
-            "user_id": {
-                "dict_key": "favoriteId",
-                "type": str
-            }
-        })
-
         self._assign(obj)
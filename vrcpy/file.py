@@ -1,42 +1,42 @@
 from vrcpy.baseobject import BaseObject
 
 class FileBase(BaseObject):
-    def __init__(self, client, obj, loop=None):
-        super().__init__(client, loop=loop)
+    required = {
+        "extension": {
+            "dict_key": "extension",
+            "type": str
+        },
+        "id": {
+            "dict_key": "id",
+            "type": str
+        },
+        "mime_type": {
+            "dict_key": "mimeType",
+            "type": str
+        },
+        "name": {
+            "dict_key": "name",
+            "type": str
+        },
+        "owner_id": {
+            "dict_key": "ownerId",
+            "type": str
+        },
+        "versions": {
+            "dict_key": "versions",
+            "type": list
+        }
+    }
 
-        self.required.update({
-            "extension": {
-                "dict_key": "extension",
-                "type": str
-            },
-            "id": {
-                "dict_key": "id",
-                "type": str
-            },
-            "mime_type": {
-                "dict_key": "mimeType",
-                "type": str
-            },
-            "name": {
-                "dict_key": "name",
-                "type": str
-            },
-            "owner_id": {
-                "dict_key": "ownerId",
-                "type": str
-            },
-            "versions": {
-                "dict_key": "versions",
-                "type": list
-            }
-        })
+    optional = {
+        "tags": {
+            "dict_key": "tags",
+            "type": list
+        }
+    }
 
-        self.optional.update({
-            "tags": {
-                "dict_key": "tags",
-                "type": list
-            }
-        })
+    def __init__(self, client, obj, loop=None):
+        super().__init__(client, loop=loop)
 
         self._assign(obj)
 
@@ -54,65 +54,65 @@ class FileBase(BaseObject):
         return FileBase(client, obj, loop)
 
 class File(BaseObject):
+    required = {
+        "category": {
+            "dict_key": "category",
+            "type": str
+        },
+        "file_name": {
+            "dict_key": "fileName",
+            "type": str
+        },
+        "size_in_bytes": {
+            "dict_key": "sizeInBytes",
+            "type": int
+        },
+        "status": {
+            "dict_key": "status",
+            "type": str
+        },
+        "upload_id": {
+            "dict_key": "uploadId",
+            "type": str
+        },
+        "url": {
+            "dict_key": "url",
+            "type": str
+        }
+    }
+
     def __init__(self, client, obj, loop=None):
         super().__init__(client, loop=loop)
 
-        self.required.update({
-            "category": {
-                "dict_key": "category",
-                "type": str
-            },
-            "file_name": {
-                "dict_key": "fileName",
-                "type": str
-            },
-            "size_in_bytes": {
-                "dict_key": "sizeInBytes",
-                "type": int
-            },
-            "status": {
-                "dict_key": "status",
-                "type": str
-            },
-            "upload_id": {
-                "dict_key": "uploadId",
-                "type": str
-            },
-            "url": {
-                "dict_key": "url",
-                "type": str
-            }
-        })
-
         self._assign(obj)
 
 class FileVersion(BaseObject):
-    def __init__(self, client, obj, loop=None):
-        super().__init__(client, loop=loop)
+    required = {
+        "created_at": {
+            "dict_key": "created_at",
+            "type": str
+        },
+        "status": {
+            "dict_key": "status",
+            "type": str
+        },
+        "version": {
+            "dict_key": "version",
+            "type": int
+        }
+    }
 
-        self.required.update({
-            "created_at": {
-                "dict_key": "created_at",
-                "type": str
-            },
-            "status": {
-                "dict_key": "status",
-                "type": str
-            },
-            "version": {
-                "dict_key": "version",
-                "type": int
-            }
-        })
+    optional = {
+        "file": {
+            "dict_key": "file",
+            "type": File
+        }
+    }
 
-        self.optional.update({
-            "file": {
-                "dict_key": "file",
-                "type": File
-            }
-        })
+    def __init__(self, client, obj, loop=None):
+        super().__init__(client, loop=loop)
 
         self._assign(obj)
 
-class IconFile(BaseObject):
+class IconFile(FileBase):
     pass
@@ -0,0 +1,248 @@
+from vrcpy.request import normalize_path
+
+import bisect
+
+class RequestHooks:
+    '''
+    Instrumentation hooks for Request, subclass and override the events
+    you want then pass to Request(hooks=[...]) or Request.add_hook
+
+    Every event gets the attempt's trace dict, which has "method",
+    "path" and "attempt", then "start", "status", "headers_at", "bytes"
+    and "end" (loop times) as the attempt goes on
+    Hooks run inline with the request so should be quick, they can
+    keep their own state in the trace dict
+    '''
+
+    def on_request_start(self, trace):
+        # An attempt is about to be sent
+        pass
+
+    def on_response_headers(self, trace, response):
+        # Status and headers of an attempt arrived
+        pass
+
+    def on_body_decoded(self, trace, data):
+        # Body of an attempt was read and decoded (None if it wasn't json)
+        pass
+
+    def on_retry(self, trace, error, delay):
+        # A failed attempt will be retried in delay seconds
+        pass
+
+    def on_rate_limited(self, trace, retry_after):
+        # Got a 429, retry_after is seconds or None
+        pass
+
+    def on_error(self, trace, error):
+        # An attempt failed
+        pass
+
+class Histogram:
+    '''
+    Fixed bucket histogram, bucket i counts values <= bounds[i]
+    '''
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        # Returns list of (bound, count of values <= bound), "+Inf" last
+        total = 0
+        buckets = []
+
+        for bound, count in zip(self.bounds + ("+Inf",), self.counts):
+            total += count
+            buckets.append((bound, total))
+
+        return buckets
+
+class EndpointMetrics:
+    # Everything collected for one (method, endpoint)
+
+    def __init__(self, bounds):
+        self.latency = Histogram(bounds)
+        self.first_byte = Histogram(bounds)
+        self.bytes = 0
+        self.statuses = {}
+        self.errors = {}
+        self.retries = 0
+        self.rate_limited = 0
+
+class MetricsCollector(RequestHooks):
+    '''
+    Keeps latency histograms, byte counts and status counts per
+    normalized endpoint ("GET /users/{id}")
+    Only does a few dict/list updates per request, so is fine to
+    leave on in production
+
+        metrics = MetricsCollector()
+        client = Client(hooks=[metrics])
+        ...
+        print(metrics.prometheus())
+    '''
+
+    default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, buckets=None, prefix="vrcpy"):
+        '''
+            buckets, tuple
+            Upper bounds in seconds of the latency histogram buckets
+
+            prefix, str
+            Prefix of exported metric names
+        '''
+
+        self.buckets = tuple(sorted(buckets or self.default_buckets))
+        self.prefix = prefix
+
+        # {(method, endpoint): EndpointMetrics}
+        self.endpoints = {}
+
+        # {path: endpoint} as normalizing every request adds up
+        self._endpoint_names = {}
+
+    def _metrics(self, trace):
+        path = trace["path"]
+
+        endpoint = self._endpoint_names.get(path)
+        if endpoint is None:
+            endpoint = normalize_path(path)
+
+            # Paths are mostly unique ids, only remember so many
+            if len(self._endpoint_names) > 10000:
+                self._endpoint_names.clear()
+            self._endpoint_names[path] = endpoint
+
+        key = (trace["method"], endpoint)
+
+        metrics = self.endpoints.get(key)
+        if metrics is None:
+            metrics = self.endpoints[key] = EndpointMetrics(self.buckets)
+
+        return metrics
+
+    def on_response_headers(self, trace, response):
+        metrics = self._metrics(trace)
+
+        metrics.first_byte.observe(trace["headers_at"] - trace["start"])
+        metrics.statuses[trace["status"]] = metrics.statuses.get(trace["status"], 0) + 1
+
+    def on_body_decoded(self, trace, data):
+        metrics = self._metrics(trace)
+
+        metrics.latency.observe(trace["end"] - trace["start"])
+        metrics.bytes += trace["bytes"]
+
+    def on_retry(self, trace, error, delay):
+        self._metrics(trace).retries += 1
+
+    def on_rate_limited(self, trace, retry_after):
+        self._metrics(trace).rate_limited += 1
+
+    def on_error(self, trace, error):
+        metrics = self._metrics(trace)
+
+        name = type(error).__name__
+        metrics.errors[name] = metrics.errors.get(name, 0) + 1
+
+    def reset(self):
+        self.endpoints.clear()
+
+    def snapshot(self):
+        '''
+        Returns dict of {"METHOD /endpoint": stats}
+            "count", responses with a body read
+            "latency_avg", "first_byte_avg", seconds
+            "latency_buckets", list of (bound, cumulative count)
+            "bytes", response body bytes
+            "statuses", {status: count}
+            "errors", {exception name: count}
+            "retries", "rate_limited", counts
+        '''
+
+        snapshot = {}
+
+        for (method, endpoint), metrics in self.endpoints.items():
+            latency = metrics.latency
+            first_byte = metrics.first_byte
+
+            snapshot["%s %s" % (method, endpoint)] = {
+                "count": latency.count,
+                "latency_avg": latency.sum / latency.count if latency.count else 0,
+                "first_byte_avg": first_byte.sum / first_byte.count if first_byte.count else 0,
+                "latency_buckets": latency.cumulative(),
+                "bytes": metrics.bytes,
+                "statuses": dict(metrics.statuses),
+                "errors": dict(metrics.errors),
+                "retries": metrics.retries,
+                "rate_limited": metrics.rate_limited
+            }
+
+        return snapshot
+
+    def prometheus(self):
+        '''
+        Returns str of everything collected in Prometheus text format
+        '''
+
+        prefix = self.prefix
+        lines = []
+
+        def labels(method, endpoint, **extra):
+            pairs = [("method", method), ("endpoint", endpoint)] + list(extra.items())
+            return "{%s}" % ",".join('%s="%s"' % (name, _escape(value)) for name, value in pairs)
+
+        def histogram(name, help, attr):
+            lines.append("# HELP %s_%s %s" % (prefix, name, help))
+            lines.append("# TYPE %s_%s histogram" % (prefix, name))
+
+            for (method, endpoint), metrics in sorted(self.endpoints.items()):
+                hist = getattr(metrics, attr)
+
+                for bound, count in hist.cumulative():
+                    lines.append("%s_%s_bucket%s %s" % (prefix, name,
+                        labels(method, endpoint, le=bound), count))
+
+                lines.append("%s_%s_sum%s %s" % (prefix, name, labels(method, endpoint), hist.sum))
+                lines.append("%s_%s_count%s %s" % (prefix, name, labels(method, endpoint), hist.count))
+
+        def counter(name, help, values):
+            lines.append("# HELP %s_%s %s" % (prefix, name, help))
+            lines.append("# TYPE %s_%s counter" % (prefix, name))
+
+            for (method, endpoint), metrics in sorted(self.endpoints.items()):
+                for extra, value in values(metrics):
+                    lines.append("%s_%s%s %s" % (prefix, name,
+                        labels(method, endpoint, **extra), value))
+
+        histogram("request_duration_seconds",
+            "Time from sending a request to its body being decoded", "latency")
+        histogram("request_first_byte_seconds",
+            "Time from sending a request to its headers arriving", "first_byte")
+
+        counter("response_bytes_total", "Response body bytes",
+            lambda metrics: [({}, metrics.bytes)])
+        counter("responses_total", "Responses by status",
+            lambda metrics: [({"status": status}, count)
+                for status, count in sorted(metrics.statuses.items())])
+        counter("request_errors_total", "Failed attempts by exception",
+            lambda metrics: [({"error": error}, count)
+                for error, count in sorted(metrics.errors.items())])
+        counter("request_retries_total", "Retried attempts",
+            lambda metrics: [({}, metrics.retries)])
+        counter("rate_limited_total", "429 responses",
+            lambda metrics: [({}, metrics.rate_limited)])
+
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -15,84 +15,102 @@ class Notification:
         friend_request = "friendRequest"
 
 class BaseNotification(BaseObject):
+    required = {
+        "id": {
+            "dict_key": "id",
+            "type": str
+        },
+        "sender_username": {
+            "dict_key": "senderUsername",
+            "type": str
+        },
+        "sender_user_id": {
+            "dict_key": "sendUserId",
+            "type": str
+        },
+        "type": {
+            "dict_key": "type",
+            "type": str
+        },
+        "created_at": {
+            "dict_key": "created_at",
+            "type": str
+        }
+    }
+
+    optional = {
+        "details": {
+            "dict_key": "details",
+            "type": dict
+        },
+        "message": {
+            "dict_key": "message",
+            "type": str
+        },
+        "seen": {
+            "dict_key": "seen",
+            "type": bool
+        }
+    }
+
+    # Fields read from obj["details"], same format as required
+    detail_required = {}
+    _detail_fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._detail_fields = cls._compile_fields("detail_required")
+
     def __init__(self, client, loop=None):
         super().__init__(client, loop)
 
-        self.required.update({
-            "id": {
-                "dict_key": "id",
-                "type": str
-            },
-            "sender_username": {
-                "dict_key": "senderUsername",
-                "type": str
-            },
-            "sender_user_id": {
-                "dict_key": "sendUserId",
-                "type": str
-            },
-            "type": {
-                "dict_key": "type",
-                "type": str
-            },
-            "created_at": {
-                "dict_key": "created_at",
-                "type": str
-            }
-        })
-
-        self.optional.update({
-            "details": {
-                "dict_key": "details",
-                "type": dict
-            },
-            "message": {
-                "dict_key": "message",
-                "type": str
-            },
-            "seen": {
-                "dict_key": "seen",
-                "type": bool
-            }
-        })
-
-        self.detail_required = {}
+    @staticmethod
+    def build_notification(client, obj, loop=None):
+        switch = {
+            "invite": InviteNotification,
+            "requestInvite": RequestInviteNotification,
+            "friendRequest": FriendRequestNotification
+        }
+
+        if obj["type"] in switch:
+            return switch[obj["type"]](client, obj, loop)
+
+        logging.debug("Unknown notification type " + obj["type"])
+
+        notification = BaseNotification(client, loop)
+        notification._assign(obj)
+        return notification
 
     def _assign(self, obj):
         super()._assign(obj)
 
         if "details" in obj and obj["details"] is not None:
-            self.required = self.detail_required
-            self.optional = {}
-
-            super()._assign(obj["details"])
-
-        del self.detail_required
+            self._assign_fields(obj["details"], self._detail_fields, ())
 
 class InviteNotification(BaseNotification):
+    detail_required = {
+        "world_id": {
+            "dict_key": "worldId",
+            "type": str
+        }
+    }
+
     def __init__(self, client, obj, loop=None):
         super().__init__(client, loop)
 
-        self.detail_required.update({
-            "world_id": {
-                "dict_key": "worldId",
-                "type": str
-            }
-        })
-
         self._assign(obj)
 
 class RequestInviteNotification(BaseNotification):
+    detail_required = {
+        "platform": {
+            "dict_key": "platform",
+            "type": str
+        }
+    }
+
     def __init__(self, client, obj, loop=None):
         super().__init__(client, loop)
 
-        self.detail_required.update({
-            "platform": {
-                "dict_key": "platform",
-                "type": str
-            }
-        })
-
         self._assign(obj)
 
 class FriendRequestNotification(BaseNotification):
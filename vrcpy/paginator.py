@@ -0,0 +1,161 @@
+from vrcpy.ratelimit import Priority
+
+import asyncio
+import logging
+
+class Paginator:
+    '''
+    Async iterator over a paged (offset/n) list endpoint
+    Yields objects as each page arrives, and fetches the next page
+    while the current one is being consumed
+
+    At most the current page and one prefetched page are held, and
+    nothing more is fetched once iteration stops (break, limit, or
+    a short page). Use "async with" or aclose() to also cancel the
+    prefetched page after a break
+
+        async for friend in client.me.iter_friends():
+            ...
+    '''
+
+    def __init__(self, client, path, build, params=None, page_size=100,
+        limit=None, prefetch=True, priority=Priority.normal):
+        '''
+            client, Client
+            Client to make requests with
+
+            path, str
+            Endpoint to page through
+
+            build, function
+            Makes an object from one item of a page
+
+            params, dict
+            Extra query params sent with each page
+
+            page_size, int
+            Items requested per page ("n")
+
+            limit, int
+            Max items to yield, None for all of them
+
+            prefetch, bool
+            Fetch the next page while the current one is consumed
+        '''
+
+        self.client = client
+        self.path = path
+        self.build = build
+        self.params = params or {}
+        self.page_size = page_size
+        self.limit = limit
+        self.prefetch = prefetch
+        self.priority = priority
+
+        self.offset = 0
+        self.yielded = 0
+        self.pages = 0
+
+        self._page = []
+        self._index = 0
+        self._next = None
+        self._done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.limit is not None and self.yielded >= self.limit:
+            await self.aclose()
+
+        while self._index >= len(self._page):
+            if self._done and self._next is None:
+                raise StopAsyncIteration
+
+            self._page = await self._take_page()
+            self._index = 0
+
+        item = self._page[self._index]
+        self._page[self._index] = None # Don't hold on to consumed items
+        self._index += 1
+        self.yielded += 1
+
+        return self.build(item)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def aclose(self):
+        '''
+        Stops fetching, cancelling any prefetched page
+        '''
+
+        self._done = True
+        self._page = []
+        self._index = 0
+
+        if self._next is not None:
+            self._next.cancel()
+            await asyncio.gather(self._next, return_exceptions=True)
+            self._next = None
+
+    async def flatten(self):
+        '''
+        Returns list of every remaining object
+        '''
+
+        return [item async for item in self]
+
+    def _start_page(self):
+        size = self.page_size
+        if self.limit is not None:
+            size = min(size, self.limit - self.offset)
+
+        if size <= 0:
+            self._done = True
+            return None
+
+        params = dict(self.params)
+        params.update({"offset": self.offset, "n": size})
+
+        self.offset += size
+
+        return self.client.loop.create_task(self._fetch(params, size))
+
+    async def _fetch(self, params, size):
+        resp = await self.client.request.call(self.path, params=params, priority=self.priority)
+        self.pages += 1
+
+        # A short page is the last one
+        if len(resp["data"]) < size:
+            self._done = True
+
+        return resp["data"]
+
+    async def _take_page(self):
+        task = self._next
+        self._next = None
+
+        if task is None:
+            task = self._start_page()
+            if task is None:
+                return []
+
+        try:
+            page = await task
+        except BaseException:
+            self._done = True
+            raise
+
+        # Copy, as the response may be shared through single-flight/cache
+        page = list(page)
+
+        if not self._done and self.prefetch:
+            self._next = self._start_page()
+
+        logging.debug("Got page %s of %s (%s items)" % (self.pages, self.path, len(page)))
+
+        return page
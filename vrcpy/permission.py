@@ -3,28 +3,28 @@ from vrcpy.baseobject import BaseObject
 # Will probably need to update these once vrc+ launches
 
 class BasePermission(BaseObject):
+    required = {
+        "id": {
+            "dict_key": "id",
+            "type": str
+        },
+        "data": {
+            "dict_key": "data",
+            "type": dict
+        },
+        "owner_id": {
+            "dict_key": "ownerId",
+            "type": str
+        },
+        "name": {
+            "dict_key": "name",
+            "type": str
+        }
+    }
+
     def __init__(self, client, loop=None):
         super().__init__(client, loop=loop)
 
-        self.required.update({
-            "id": {
-                "dict_key": "id",
-                "type": str
-            },
-            "data": {
-                "dict_key": "data",
-                "type": dict
-            },
-            "owner_id": {
-                "dict_key": "ownerId",
-                "type": str
-            },
-            "name": {
-                "dict_key": "name",
-                "type": str
-            }
-        })
-
     @staticmethod
     def build_permission(self, client, obj, loop=None):
         switch = {
@@ -42,7 +42,7 @@ class EarlyAdopterPermission(BasePermission):
 
         self._assign(obj)
 
-class ExtraFavoriteGroupPermission:
+class ExtraFavoriteGroupPermission(BasePermission):
     def __init__(self, client, obj=None, loop=None):
         super().__init__(client, loop=loop)
 
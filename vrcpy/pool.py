@@ -0,0 +1,259 @@
+from vrcpy.client import Client
+from vrcpy.request import ApiConfig, connector_health
+
+import asyncio
+import aiohttp
+import logging
+
+class ClientPool:
+    '''
+    Runs many logged in Clients on one event loop
+
+    Every account shares one connection pool (connections and DNS
+    lookups are reused) and one ApiConfig (apiKey is fetched once)
+    Each account keeps its own session, cookie jar, rate limit
+    budget (RequestScheduler) and response cache
+
+        pool = ClientPool()
+        await pool.add("bot1", b64=...)
+        await pool.add("bot2", username=..., password=...)
+        pool["bot1"].me.display_name
+    '''
+
+    def __init__(self, loop=None, pool_size=100, pool_size_per_host=20,
+        keepalive_timeout=30, dns_cache_ttl=300, config=None,
+        config_cache_path=None, config_cache_ttl=3600, **client_options):
+        '''
+            pool_size, int
+            Max connections open at once across all accounts
+
+            pool_size_per_host, int
+            Max connections to one host across all accounts
+
+            keepalive_timeout, int/float
+            Seconds an idle connection is kept for reuse
+
+            dns_cache_ttl, int
+            Seconds resolved hosts are cached for
+
+            config, ApiConfig
+            Config/apiKey holder to share, made if None
+
+            config_cache_path, str
+            File to persist config to, see ApiConfig
+
+        client_options are passed to every Client made by add
+        '''
+
+        self.loop = loop or asyncio.get_event_loop()
+
+        self.pool_size = pool_size
+        self.pool_size_per_host = pool_size_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+
+        self.config = config or ApiConfig(config_cache_path, config_cache_ttl)
+        self.client_options = client_options
+
+        # Made lazily as aiohttp wants a running loop
+        self.connector = None
+
+        # {name: Client}
+        self.clients = {}
+        # {name: loop time the account was added}
+        self.added_at = {}
+        # {name: ws loop task}, see start
+        self.tasks = {}
+
+    def __getitem__(self, name):
+        return self.clients[name]
+
+    def __contains__(self, name):
+        return name in self.clients
+
+    def __iter__(self):
+        return iter(self.clients.values())
+
+    def __len__(self):
+        return len(self.clients)
+
+    def _get_connector(self):
+        if self.connector is None or self.connector.closed:
+            self.connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl
+            )
+
+        return self.connector
+
+    def create_client(self, name, **client_options):
+        '''
+        Makes a Client on the shared pool without logging it in
+        Returns the Client
+
+            name, str
+            Name to keep the account under
+
+        client_options override the pool's client_options
+        '''
+
+        if name in self.clients:
+            raise KeyError("Client %s is already in the pool" % name)
+
+        options = dict(self.client_options)
+        options.update(client_options)
+
+        client = Client(
+            loop=self.loop,
+            connector=self._get_connector(),
+            config=self.config,
+            **options
+        )
+
+        self.clients[name] = client
+        self.added_at[name] = self.loop.time()
+
+        return client
+
+    async def add(self, name, username=None, password=None, b64=None, mfa=None,
+        **client_options):
+        '''
+        Makes a Client on the shared pool and logs it in
+        Returns the Client
+
+            name, str
+            Name to keep the account under
+
+            username, password, b64, mfa
+            Login details, see Client.login2fa
+
+        client_options override the pool's client_options
+        '''
+
+        client = self.create_client(name, **client_options)
+
+        try:
+            await client.login2fa(username, password, b64, mfa)
+        except Exception:
+            await self.remove(name, unauth=False)
+            raise
+
+        return client
+
+    async def add_many(self, accounts, concurrency=10):
+        '''
+        Logs in many accounts, a few at a time
+        Returns dict of {name: exception} for accounts that failed
+
+            accounts, dict
+            {name: dict of add() arguments}
+
+            concurrency, int
+            Max logins in flight at once
+        '''
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        failed = {}
+
+        async def add(name, login):
+            async with semaphore:
+                try:
+                    await self.add(name, **login)
+                except Exception as e:
+                    logging.warning("Couldn't log in %s (%s)" % (name, e))
+                    failed[name] = e
+
+        await asyncio.gather(*[add(name, login) for name, login in accounts.items()])
+
+        return failed
+
+    def start(self, names=None):
+        '''
+        Starts the ws loop of each account as a task
+
+            names, list
+            Accounts to start, None for all
+        '''
+
+        for name in self.clients if names is None else names:
+            task = self.tasks.get(name)
+            if task is None or task.done():
+                self.tasks[name] = self.loop.create_task(self.clients[name].start())
+
+    async def remove(self, name, unauth=True):
+        '''
+        Logs out an account and takes it out of the pool
+
+            name, str
+            Account to remove
+
+            unauth, bool
+            If should unauth the session cookie
+        '''
+
+        client = self.clients.pop(name)
+        self.added_at.pop(name, None)
+
+        task = self.tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+
+        try:
+            await client.logout(unauth=unauth and client.me is not None)
+        except Exception as e:
+            logging.warning("Error logging out %s (%s)" % (name, e))
+
+    async def close(self, unauth=True):
+        '''
+        Logs out every account and closes the shared connection pool
+
+            unauth, bool
+            If should unauth the session cookies
+        '''
+
+        await asyncio.gather(*[
+            self.remove(name, unauth) for name in list(self.clients)
+        ])
+
+        if self.connector is not None:
+            await self.connector.close()
+            self.connector = None
+
+    def stats(self):
+        '''
+        Returns dict of pool stats for monitoring
+            "accounts", number of accounts
+            "sent", "failed", requests across all accounts
+            "requests_per_sec", across all accounts
+            "connections", occupancy of the shared pool, see connector_health
+            "per_account", {name: {"sent", "failed", "requests_per_sec",
+                "uptime", "scheduler"}} see RequestScheduler.stats
+        '''
+
+        now = self.loop.time()
+        per_account = {}
+
+        for name, client in self.clients.items():
+            request = client.request
+            uptime = now - self.added_at[name]
+
+            per_account[name] = {
+                "sent": request.sent,
+                "failed": request.failed,
+                "requests_per_sec": request.sent / uptime if uptime > 0 else 0,
+                "uptime": uptime,
+                "scheduler": request.scheduler.stats()
+            }
+
+        return {
+            "accounts": len(self.clients),
+            "sent": sum(account["sent"] for account in per_account.values()),
+            "failed": sum(account["failed"] for account in per_account.values()),
+            "requests_per_sec": sum(
+                account["requests_per_sec"] for account in per_account.values()),
+            "connections": connector_health(self.connector),
+            "per_account": per_account
+        }
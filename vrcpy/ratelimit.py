@@ -0,0 +1,234 @@
+import heapq
+import asyncio
+import logging
+import itertools
+
+class Priority:
+    # Lower goes first
+
+    interactive = 0
+    normal = 1
+    background = 2
+
+    names = {
+        0: "interactive",
+        1: "normal",
+        2: "background"
+    }
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        '''
+            rate, int/float
+            Tokens added per second, None for no limit (only
+            paused_until applies)
+
+            burst, int
+            Max tokens the bucket holds
+        '''
+
+        self.rate = rate
+        self.burst = burst
+
+        self.tokens = burst
+        self.updated = None
+        self.paused_until = 0
+
+    def _refill(self, now):
+        if self.rate is None:
+            return
+
+        if self.updated is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_in(self, now):
+        # Seconds until a token can be taken, 0 if one can be taken now
+        self._refill(now)
+
+        wait = max(0, self.paused_until - now)
+        if self.rate is not None and self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+
+        return wait
+
+    def take(self, now):
+        if self.rate is None:
+            return
+
+        self._refill(now)
+        self.tokens -= 1
+
+class RequestScheduler:
+    '''
+    Paces outgoing requests with a token bucket per endpoint family
+    (first path segment, "/users/x" is "users")
+
+    Waiting requests are let through in Priority order, a family that's
+    out of tokens doesn't hold up other families
+
+    By default nothing is paced, requests only wait out a rate limit
+    pause (after a 429), pass rates/default_rate to pace them
+    '''
+
+    def __init__(self, rates=None, default_rate=None, rate_limit_pause=5, loop=None):
+        '''
+            rates, dict
+            {"family": (per second, burst)} overrides
+
+            default_rate, tuple
+            (per second, burst) of families not in rates, None to not
+            pace them
+
+            rate_limit_pause, int
+            Seconds to pause everything after a 429 without Retry-After
+        '''
+
+        self.loop = loop or asyncio.get_event_loop()
+
+        self.rates = rates or {}
+        self.default_rate = default_rate
+        self.rate_limit_pause = rate_limit_pause
+
+        self.buckets = {}
+        self.paused_until = 0
+
+        self._waiting = []
+        self._counter = itertools.count()
+        self._timer = None
+
+        self.throttled = 0
+        self.waits = {
+            lane: {"count": 0, "total": 0, "max": 0}
+            for lane in Priority.names.values()
+        }
+
+    @staticmethod
+    def family(path):
+        return path.strip("/").split("/")[0].split("?")[0]
+
+    def _bucket(self, family):
+        if family not in self.buckets:
+            self.buckets[family] = TokenBucket(*(self.rates.get(family, self.default_rate) or (None, None)))
+
+        return self.buckets[family]
+
+    def _ready_in(self, family, now):
+        return max(self.paused_until - now, self._bucket(family).ready_in(now))
+
+    def _record(self, priority, waited):
+        wait = self.waits[Priority.names.get(priority, "normal")]
+
+        wait["count"] += 1
+        wait["total"] += waited
+        wait["max"] = max(wait["max"], waited)
+
+    async def acquire(self, path, priority=Priority.normal):
+        '''
+        Waits until a request to path is allowed to go out
+
+            path, str
+            Path of the request
+
+            priority, int
+            Priority lane of the request
+        '''
+
+        family = self.family(path)
+        now = self.loop.time()
+
+        if not self._waiting and self._ready_in(family, now) == 0:
+            self._bucket(family).take(now)
+            self._record(priority, 0)
+            return
+
+        future = self.loop.create_future()
+        heapq.heappush(self._waiting, (priority, next(self._counter), family, future, now))
+
+        self._pump()
+        await future
+
+    def _pump(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        now = self.loop.time()
+        delay = None
+
+        waiting = []
+        blocked = set()
+
+        for entry in sorted(self._waiting):
+            priority, _, family, future, queued = entry
+
+            # Cancelled waiters just drop out
+            if future.done():
+                continue
+
+            # Keep priority order inside a family
+            if family in blocked:
+                waiting.append(entry)
+                continue
+
+            wait = self._ready_in(family, now)
+            if wait == 0:
+                self._bucket(family).take(now)
+                self._record(priority, now - queued)
+                future.set_result(None)
+            else:
+                blocked.add(family)
+                waiting.append(entry)
+                delay = wait if delay is None else min(delay, wait)
+
+        heapq.heapify(waiting)
+        self._waiting = waiting
+
+        if delay is not None:
+            self._timer = self.loop.call_later(delay, self._pump)
+
+    def throttle(self, path, retry_after=None):
+        '''
+        Pauses all requests after being rate limited
+
+            path, str
+            Path of the request that got rate limited
+
+            retry_after, int/float
+            Seconds the server asked us to wait, None for the default
+        '''
+
+        pause = self.rate_limit_pause if retry_after is None else retry_after
+        until = self.loop.time() + pause
+
+        logging.warning("Rate limited at %s, pausing requests for %ss" % (path, pause))
+
+        self.throttled += 1
+        self.paused_until = max(self.paused_until, until)
+
+        bucket = self._bucket(self.family(path))
+        bucket.paused_until = max(bucket.paused_until, until)
+        bucket.tokens = 0
+
+        self._pump()
+
+    def stats(self):
+        '''
+        Returns dict of scheduler stats for monitoring
+            "queued", {lane: number of requests waiting}
+            "waits", {lane: {"count", "total", "max"}} wait times in seconds
+            "paused_for", seconds left of a rate limit pause
+            "throttled", number of times we got rate limited
+        '''
+
+        queued = {lane: 0 for lane in Priority.names.values()}
+        for entry in self._waiting:
+            if not entry[3].done():
+                queued[Priority.names.get(entry[0], "normal")] += 1
+
+        return {
+            "queued": queued,
+            "waits": {lane: dict(wait) for lane, wait in self.waits.items()},
+            "paused_for": max(0, self.paused_until - self.loop.time()),
+            "throttled": self.throttled
+        }
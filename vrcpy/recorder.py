@@ -0,0 +1,304 @@
+import os
+import time
+import struct
+import asyncio
+import logging
+
+# Every record is a header (receive time, frame length) then the frame
+_header = struct.Struct("<dI")
+
+def recorded_files(path):
+    '''
+    Returns list of a recording's files, oldest first
+    (path.N ... path.1 rotated by PipelineRecorder, then path)
+
+        path, str
+        Path the recording was made to
+    '''
+
+    files = []
+    n = 1
+    while os.path.isfile("%s.%s" % (path, n)):
+        files.append("%s.%s" % (path, n))
+        n += 1
+
+    files.reverse()
+
+    if os.path.isfile(path):
+        files.append(path)
+
+    return files
+
+def read_frames(path):
+    '''
+    Yields (receive time, frame bytes) of a recording file
+    A record cut short (crash mid write) ends the file
+
+        path, str
+        Recording file to read
+    '''
+
+    with open(path, "rb") as file:
+        while True:
+            header = file.read(_header.size)
+            if len(header) < _header.size:
+                return
+
+            received, length = _header.unpack(header)
+
+            frame = file.read(length)
+            if len(frame) < length:
+                logging.warning("Recording %s ends with a partial frame" % path)
+                return
+
+            yield received, frame
+
+class PipelineRecorder:
+    '''
+    Appends raw pipeline frames with their receive time to a file
+    Writes are buffered, and the file is rotated at max_bytes
+    (path -> path.1 -> path.2 ...) keeping backups old files
+
+        recorder = PipelineRecorder("pipeline.rec")
+        client = Client(recorder=recorder)
+        ...
+        recorder.close()
+    '''
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, backups=5,
+        buffer_size=64 * 1024, flush_interval=1, loop=None):
+        '''
+            path, str
+            File to record to, appended to if it exists
+
+            max_bytes, int
+            Size a file is rotated at, 0 to never rotate
+
+            backups, int
+            Rotated files to keep
+
+            buffer_size, int
+            Bytes buffered before writing
+
+            flush_interval, int/float
+            Max seconds a frame sits in the buffer (flushed by a timer
+            on loop, so quiet pipelines get written too)
+        '''
+
+        self.loop = loop or asyncio.get_event_loop()
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+
+        self.frames = 0
+        self.bytes = 0
+
+        self._buffer = bytearray()
+        self._flushed_at = time.monotonic()
+        self._timer = None
+
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def record(self, data, received=None):
+        '''
+        Adds a frame to the recording
+
+            data, str/bytes
+            Frame as received from the ws
+
+            received, float
+            Unix time the frame was received, now if None
+        '''
+
+        if self._file is None:
+            return
+
+        if isinstance(data, str):
+            data = data.encode()
+
+        self._buffer += _header.pack(time.time() if received is None else received, len(data))
+        self._buffer += data
+
+        self.frames += 1
+        self.bytes += _header.size + len(data)
+
+        if len(self._buffer) >= self.buffer_size \
+            or time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+        elif self._timer is None:
+            self._timer = self.loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self):
+        '''
+        Writes buffered frames to the file
+        '''
+
+        self._flushed_at = time.monotonic()
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self._buffer or self._file is None:
+            return
+
+        if self.max_bytes and self._size and self._size + len(self._buffer) > self.max_bytes:
+            self._rotate()
+
+        self._file.write(self._buffer)
+        self._file.flush()
+
+        self._size += len(self._buffer)
+        self._buffer = bytearray()
+
+    def _rotate(self):
+        self._file.close()
+
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.isfile("%s.%s" % (self.path, n)):
+                os.replace("%s.%s" % (self.path, n), "%s.%s" % (self.path, n + 1))
+
+        if self.backups:
+            os.replace(self.path, self.path + ".1")
+        else:
+            os.remove(self.path)
+
+        logging.debug("Rotated pipeline recording " + self.path)
+
+        self._file = open(self.path, "ab")
+        self._size = 0
+
+    def close(self):
+        '''
+        Flushes and closes the recording
+        '''
+
+        if self._file is None:
+            return
+
+        self.flush()
+        self._file.close()
+        self._file = None
+
+class PipelineReplayer:
+    '''
+    Feeds a recording into a Client's event path (Client._on_frame),
+    without a network connection, keeping the recorded gaps between
+    frames scaled by speed
+
+    Handlers that need the api (friend-offline/friend-delete of a
+    friend not in client.friends) will fail, fill client.friends
+    first (see prime_friends) to avoid that
+
+        replayer = PipelineReplayer(client, "pipeline.rec", speed=10)
+        stats = await replayer.replay()
+    '''
+
+    def __init__(self, client, path, speed=1):
+        '''
+            client, Client
+            Client to feed, doesn't need to be logged in
+
+            path, str/list
+            Recording path (rotated files included, see recorded_files)
+            or list of recording files in order
+
+            speed, int/float
+            1 for real time, N for N times faster, 0 for as fast as
+            frames can be handled
+        '''
+
+        self.client = client
+        self.files = recorded_files(path) if isinstance(path, str) else list(path)
+        self.speed = speed
+
+    def frames(self):
+        # Yields (receive time, frame) across every file
+        for path in self.files:
+            yield from read_frames(path)
+
+    def prime_friends(self):
+        '''
+        Puts every user seen in the recording's friend events in
+        client.friends, so replaying needs no api calls
+        Returns number of friends added
+        '''
+
+        client = self.client
+        added = 0
+
+        for received, frame in self.frames():
+            message = client.codec.loads(frame)
+            if not message["type"].startswith("friend-"):
+                continue
+
+            content = client.codec.loads(message["content"])
+            if not isinstance(content.get("user"), dict) or content["user"]["id"] in client.friends:
+                continue
+
+            client.friends.put(client._canonical(client._User, content["user"]))
+            added += 1
+
+        return added
+
+    async def replay(self):
+        '''
+        Replays the recording, returns once every event was handled
+        (unless the client's dispatcher was already running)
+        Returns dict of
+            "frames", frames replayed
+            "seconds", time taken
+            "frames_per_sec", frames replayed per second
+            "behind_max", most seconds a frame went out after its
+                scaled time (how far the event path fell behind)
+        '''
+
+        client = self.client
+        loop = client.loop
+        dispatcher = client.dispatcher
+
+        started_dispatcher = not dispatcher.running
+        if started_dispatcher:
+            dispatcher.start()
+
+        frames = 0
+        behind_max = 0
+        first = None
+        start = loop.time()
+
+        try:
+            for received, frame in self.frames():
+                if first is None:
+                    first = received
+
+                if self.speed:
+                    due = start + (received - first) / self.speed
+                    delay = due - loop.time()
+
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    else:
+                        behind_max = max(behind_max, -delay)
+
+                await client._on_frame(frame)
+                frames += 1
+        finally:
+            if started_dispatcher:
+                await dispatcher.stop()
+
+        seconds = loop.time() - start
+
+        return {
+            "frames": frames,
+            "seconds": seconds,
+            "frames_per_sec": frames / seconds if seconds else 0,
+            "behind_max": behind_max
+        }
@@ -1,21 +1,313 @@
+import os
+import re
 import json
+import time
 import asyncio
 import aiohttp
 import logging
 
 from vrcpy.errors import *
+from vrcpy.ratelimit import Priority, RequestScheduler
+from vrcpy.retry import RetryPolicy
+from vrcpy.cache import ResponseCache
+
+# Path segments that are ids ("usr_...", "wrld_...", "12345~private(...)")
+_id_segment = re.compile(r"^([a-z]{3,4}_[0-9a-zA-Z-]+|[0-9]+|.*[~:].*)$")
+
+def normalize_path(path):
+    '''
+    Replaces ids in a path so it names an endpoint
+    "/users/usr_123" becomes "/users/{id}"
+
+        path, str
+        Path of a request
+    '''
+
+    return "/" + "/".join(
+        "{id}" if _id_segment.match(part) else part
+        for part in path.split("?")[0].strip("/").split("/")
+    )
+
+def connector_health(connector):
+    '''
+    Returns dict of connection pool occupancy, for sizing limit/limit_per_host
+        "limit", "limit_per_host", pool limits (0 is unlimited)
+        "in_use", connections handed out right now
+        "idle", open connections waiting to be reused
+        "waiting", requests waiting for a free connection
+        "occupancy", in_use / limit
+        "per_host", {host: connections in use}
+
+        connector, aiohttp.BaseConnector
+        Pool to look at, None for an empty view
+    '''
+
+    if connector is None or connector.closed:
+        return {"limit": 0, "limit_per_host": 0, "in_use": 0, "idle": 0,
+            "waiting": 0, "occupancy": 0, "per_host": {}}
+
+    # aiohttp has no public api for these
+    in_use = len(connector._acquired)
+    per_host = {}
+    for key, conns in connector._acquired_per_host.items():
+        if conns:
+            per_host[key.host] = per_host.get(key.host, 0) + len(conns)
+
+    return {
+        "limit": connector.limit,
+        "limit_per_host": connector.limit_per_host,
+        "in_use": in_use,
+        "idle": sum(len(conns) for conns in connector._conns.values()),
+        "waiting": sum(len(waiters) for waiters in connector._waiters.values()),
+        "occupancy": in_use / connector.limit if connector.limit else 0,
+        "per_host": per_host
+    }
+
+class ApiConfig:
+    '''
+    Holds the /config payload, which has the apiKey every call needs
+    Only one fetch is ever in flight, everyone else waits on it
+
+    Can be shared by several Request objects
+    '''
+
+    def __init__(self, cache_path=None, cache_ttl=3600):
+        '''
+            cache_path, str
+            File to persist the config payload to, None to not persist
+
+            cache_ttl, int
+            Seconds a persisted config payload stays valid
+        '''
+
+        self.cache_path = cache_path
+        self.cache_ttl = cache_ttl
+
+        self.data = None
+        self.fetched_at = None
+        self._task = None
+
+    @property
+    def api_key(self):
+        if self.data is None:
+            return None
+
+        return self.data["apiKey"]
+
+    @api_key.setter
+    def api_key(self, value):
+        self.data = None if value is None else {"apiKey": value}
+        self.fetched_at = time.time()
+
+    async def get_api_key(self, request):
+        '''
+        Returns the apiKey, fetching config if we don't have it yet
+
+            request, Request
+            Request to fetch config with
+        '''
+
+        if self.data is not None:
+            return self.api_key
+
+        if self._task is None:
+            self._start(self._load(request))
+
+        # Shielded so one cancelled caller doesn't cancel everyone's fetch
+        await asyncio.shield(self._task)
+        return self.api_key
+
+    async def refresh(self, request, rejected):
+        '''
+        Refetches config after an apiKey got rejected
+        Skips the persisted cache, does nothing if someone already refreshed
+
+            request, Request
+            Request to fetch config with
+
+            rejected, str
+            The apiKey that was rejected
+        '''
+
+        if self._task is None and self.api_key == rejected:
+            self.data = None
+            self._start(self._fetch(request))
+
+        return await self.get_api_key(request)
+
+    def _start(self, coro):
+        self._task = asyncio.ensure_future(coro)
+        self._task.add_done_callback(self._done)
+
+    def _done(self, task):
+        if self._task is task:
+            self._task = None
+
+    async def _load(self, request):
+        if self._read_cache():
+            logging.debug("Using cached config from " + self.cache_path)
+            return
+
+        await self._fetch(request)
+
+    async def _fetch(self, request):
+        logging.warning("VRC API Key has not been fetched, fetching")
+
+        async with request._get_anon_session().get(request.base + "/config",
+            ssl=request.verify) as resp:
+
+            assert resp.status == 200
+            j = await resp.json()
+
+        if "apiKey" not in j:
+            raise ClientErrors.OutOfDate(
+                "This API wrapper is too outdated to function (https://api.vrchat.cloud/api/1/config doesn't contain apiKey)"
+            )
+
+        self.data = j
+        self.fetched_at = time.time()
+        self._write_cache()
+
+    def _read_cache(self):
+        if self.cache_path is None or not os.path.isfile(self.cache_path):
+            return False
+
+        try:
+            with open(self.cache_path) as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            logging.warning("Couldn't read config cache " + self.cache_path)
+            return False
+
+        if time.time() - cache["fetched_at"] > self.cache_ttl \
+            or "apiKey" not in cache["config"]:
+            return False
+
+        self.data = cache["config"]
+        self.fetched_at = cache["fetched_at"]
+        return True
+
+    def _write_cache(self):
+        if self.cache_path is None:
+            return
+
+        # Write then rename so other workers never read half a file
+        tmp = "%s.%s.tmp" % (self.cache_path, os.getpid())
+
+        try:
+            with open(tmp, "w") as file:
+                json.dump({"fetched_at": self.fetched_at, "config": self.data}, file)
+            os.replace(tmp, self.cache_path)
+        except OSError:
+            logging.warning("Couldn't write config cache " + self.cache_path)
 
 class Request:
     request_retries = 1
 
-    def __init__(self, loop=None, user_agent=None, verify=True):
+    def __init__(self, loop=None, user_agent=None, verify=True, pool_size=100,
+        pool_size_per_host=20, keepalive_timeout=30, dns_cache_ttl=300, timeout=None,
+        connect_timeout=15, first_byte_timeout=30, total_timeout=60, config=None, config_cache_path=None, config_cache_ttl=3600, scheduler=None,
+        retry_policy=None, singleflight=True, cache=None, connector=None, hooks=None,
+        base_url=None):
+
         self.verify = verify
         self.loop = loop or asyncio.get_event_loop()
         self.user_agent = user_agent or ""
 
+        # Connection pool options, see aiohttp.TCPConnector
+        self.pool_size = pool_size
+        self.pool_size_per_host = pool_size_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+
+        # Default deadlines of a call, see call's timeout
+        # total covers the whole call, retries and rate limit waits included
+        # first_byte_timeout (sock_read) also bounds each later read
+        self.timeout = timeout or aiohttp.ClientTimeout(
+            total=total_timeout,
+            connect=connect_timeout,
+            sock_read=first_byte_timeout
+        )
+
+        # One pool shared by the authed session and anonymous calls
+        # Made lazily as aiohttp wants a running loop, unless a shared
+        #   connector is passed in (see ClientPool), which we never close
+        self.connector = connector
+        self.owns_connector = connector is None
+        self.anon_session = None
+
+        # apiKey holder, may be shared with other Request objects
+        self.config = config or ApiConfig(config_cache_path, config_cache_ttl)
+
+        # Paces requests, see RequestScheduler
+        # The default one doesn't pace, only pauses after a 429
+        self.scheduler = scheduler or RequestScheduler(loop=self.loop)
+
+        # Decides what gets retried, see RetryPolicy
+        self.retry_policy = retry_policy or RetryPolicy(retries=self.request_retries)
+
+        # {"/users/{id}": number of retries}
+        self.retry_counts = {}
+
+        # Requests sent, and calls that failed after all retries
+        self.sent = 0
+        self.failed = 0
+
+        # Identical GETs in flight at once share one request
+        self.singleflight = singleflight
+        self.singleflight_stats = {"hits": 0, "misses": 0}
+        self._inflight = {}
+
+        # GET response cache, see ResponseCache
+        self.cache = ResponseCache() if cache is None else cache
+
+        # Instrumentation, see vrcpy.metrics.RequestHooks
+        self.hooks = list(hooks or [])
+
         self.session = None
-        self.apiKey = None
-        self.base = "https://api.vrchat.cloud/api/1"
+        self.base = base_url or "https://api.vrchat.cloud/api/1"
+
+    @property
+    def apiKey(self):
+        return self.config.api_key
+
+    @apiKey.setter
+    def apiKey(self, value):
+        self.config.api_key = value
+
+    def _get_connector(self):
+        if not self.owns_connector:
+            return self.connector
+
+        if self.connector is None or self.connector.closed:
+            self.connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl
+            )
+
+        return self.connector
+
+    def _make_session(self, headers, cookie_jar=None):
+        return aiohttp.ClientSession(
+            connector=self._get_connector(),
+            connector_owner=False,
+            headers=headers,
+            timeout=self.timeout,
+            cookie_jar=cookie_jar
+        )
+
+    def _get_anon_session(self):
+        if self.anon_session is None or self.anon_session.closed:
+            # Never keeps cookies, login's auth cookie would otherwise
+            #   go out with every later anonymous call (login reads it
+            #   from the response headers)
+            self.anon_session = self._make_session({"user-agent": self.user_agent},
+                aiohttp.DummyCookieJar())
+
+        return self.anon_session
 
     def new_session(self, b64_auth):
         if self.session is not None:
@@ -27,94 +319,367 @@ class Request:
             "Authorization": "Basic "+b64_auth
         }
 
-        self.session = aiohttp.ClientSession(headers=headers)
+        self.session = self._make_session(headers)
 
     async def close_session(self):
-        await self.session.close()
+        if self.session is not None:
+            await self.session.close()
         self.session = None
 
+    def add_hook(self, hook):
+        '''
+        Adds an instrumentation hook, see vrcpy.metrics.RequestHooks
+
+            hook, RequestHooks
+            Object with on_<event> methods
+        '''
+
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def _emit(self, event, *args):
+        # Hooks must never break a request
+        for hook in self.hooks:
+            try:
+                getattr(hook, "on_" + event)(*args)
+            except Exception:
+                logging.exception("Error in %s hook" % event)
+
+    def health(self):
+        '''
+        Returns dict of connection pool occupancy, see connector_health
+        '''
+
+        return connector_health(self.connector)
+
+    async def close(self):
+        '''
+        Closes all sessions and the connection pool
+        '''
+
+        await self.close_session()
+
+        if self.anon_session is not None:
+            await self.anon_session.close()
+            self.anon_session = None
+
+        if self.connector is not None and self.owns_connector:
+            await self.connector.close()
+            self.connector = None
+
     async def call(self, path, method="GET", headers={}, params={}, jdict={},
-        no_auth=False, retries=None, verify=None):
+        no_auth=False, retries=None, verify=None, priority=Priority.normal,
+        timeout=None):
+        '''
+        Makes a request to the VRC api
+        Returns dict of "status", "response" and "data" (decoded json)
+
+            priority, int
+            Priority lane of this request, see vrcpy.ratelimit.Priority
+
+            timeout, aiohttp.ClientTimeout/int/float
+            Deadlines of this call (total, connect, sock_read for first
+            byte), a number is the total, None for self.timeout
+            Raises RequestErrors.Timeout when the total runs out
+            The total starts once the rate limit scheduler lets the
+            request out, a call sharing an in flight GET keeps to the
+            first caller's deadlines
+
+        Identical GET requests made while one is in flight share its
+        result (the same dict, don't modify it)
+
+        GETs of endpoints with a TTL in self.cache are answered from
+        cache while fresh, then revalidated with If-None-Match
+        '''
+
+        entry = None
+        cache_key = None
+
+        if method.upper() == "GET" and not no_auth:
+            ttl = self.cache.ttl(normalize_path(path))
+
+            if ttl:
+                cache_key = (path, tuple(sorted((k, str(v)) for k, v in params.items())))
+                entry = self.cache.get(cache_key)
+
+                if entry is not None and self.cache.fresh(entry):
+                    self.cache.hits += 1
+                    return entry["response"]
+
+                self.cache.misses += 1
+
+                if entry is not None and entry["etag"] is not None:
+                    headers = dict(headers, **{"If-None-Match": entry["etag"]})
+
+        if timeout is None:
+            timeout = self.timeout
+        elif not isinstance(timeout, aiohttp.ClientTimeout):
+            timeout = aiohttp.ClientTimeout(total=timeout,
+                connect=self.timeout.connect, sock_read=self.timeout.sock_read)
+
+        resp = await self._call_shared(path, method, headers, params, jdict,
+            no_auth, retries, verify, priority, timeout)
+
+        if cache_key is not None:
+            if resp["status"] == 304 and entry is not None:
+                self.cache.refresh(entry)
+                return entry["response"]
+
+            size = resp["response"].content_length
+            if size is None:
+                size = len(json.dumps(resp["data"]))
+
+            self.cache.put(cache_key, path, resp, ttl, size,
+                resp["response"].headers.get("ETag"))
+
+        return resp
+
+    async def _call_shared(self, path, method, headers, params, jdict,
+        no_auth, retries, verify, priority, timeout):
+
+        key = None
+        if self.singleflight and method.upper() in ("GET", "HEAD"):
+            key = (
+                method.upper(), path, no_auth,
+                tuple(sorted((k, str(v)) for k, v in params.items())),
+                tuple(sorted(headers.items())),
+                json.dumps(jdict, sort_keys=True) if jdict else None
+            )
 
-        retries = retries or self.request_retries
+        if key is None:
+            return await self._call_retrying(path, method, headers, params, jdict,
+                no_auth, retries, verify, priority, timeout)
+
+        flight = self._inflight.get(key)
+
+        if flight is None:
+            self.singleflight_stats["misses"] += 1
+
+            flight = self.loop.create_task(self._call_retrying(path, method, headers,
+                params, jdict, no_auth, retries, verify, priority, timeout))
+            flight.add_done_callback(lambda task: self._land(key, task))
+
+            self._inflight[key] = flight
+        else:
+            self.singleflight_stats["hits"] += 1
+
+        # Shielded so one cancelled caller doesn't cancel the others
+        return await asyncio.shield(flight)
+
+    def _land(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+        # Mark as retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def _call_retrying(self, path, method, headers, params, jdict,
+        no_auth, retries, verify, priority, timeout):
+
+        if retries is None:
+            retries = self.retry_policy.retries
         verify = verify or self.verify
 
-        resp = None
+        policy = self.retry_policy
+
+        # Stop retrying at the policy's deadline, give up at the total
+        # The total starts once the scheduler lets the first attempt out,
+        #   so waiting our turn under a rate limit doesn't eat into it
+        retry_deadline = None if policy.deadline is None else self.loop.time() + policy.deadline
+        deadline = None
+
         for attempt in range(0, retries + 1):
+            trace = {"method": method.upper(), "path": path, "attempt": attempt}
+
+            await self._pace(path, priority)
+
+            if deadline is None and timeout.total is not None:
+                deadline = self.loop.time() + timeout.total
+
+            remaining = None if deadline is None else deadline - self.loop.time()
+
+            # Cancelling the attempt releases its connection, see _send
             try:
-                resp = await self._call(path, method, headers, params, jdict, no_auth, verify)
-                break
+                return await asyncio.wait_for(
+                    self._call(path, method, headers, params, jdict, no_auth,
+                        verify, priority, self._attempt_timeout(timeout, remaining), trace),
+                    remaining
+                )
             except Exception as e:
-                if attempt == retries:
-                    raise RequestErrors.RequestError(
-                        "{} ({} retries)".format(e, retries)
-                    )
+                error = e
 
-        return resp
+                if self.hooks:
+                    self._emit("error", trace, error)
+
+            if attempt == retries or not policy.should_retry(method, error):
+                break
+
+            delay = policy.delay(attempt)
+            if retry_deadline is not None and self.loop.time() + delay > retry_deadline:
+                break
+            if deadline is not None and self.loop.time() + delay >= deadline:
+                break
+
+            endpoint = normalize_path(path)
+            self.retry_counts[endpoint] = self.retry_counts.get(endpoint, 0) + 1
+
+            if self.hooks:
+                self._emit("retry", trace, error, delay)
+
+            logging.debug("Retrying %s %s in %.2fs (%s)" % (method, path, delay, error))
+            await asyncio.sleep(delay)
+
+        self.failed += 1
+
+        if deadline is not None and isinstance(error, asyncio.TimeoutError) \
+            and self.loop.time() >= deadline:
+
+            raise RequestErrors.Timeout(
+                "%s %s timed out after %ss (%s retries)" % (method, path, timeout.total, attempt)
+            ) from error
+
+        raise RequestErrors.RequestError(
+            "{} ({} retries)".format(error, attempt)
+        ) from error
+
+    @staticmethod
+    def _attempt_timeout(timeout, remaining):
+        # An attempt gets what's left of the total
+        if remaining is None:
+            return timeout
+
+        return aiohttp.ClientTimeout(
+            total=max(remaining, 0),
+            connect=timeout.connect,
+            sock_read=timeout.sock_read,
+            sock_connect=timeout.sock_connect
+        )
 
     async def _call(self, path, method="GET", headers={}, params={},
-        jdict={}, no_auth=False, verify=None):
+        jdict={}, no_auth=False, verify=None, priority=Priority.normal, timeout=None,
+        trace=None):
 
         verify = verify or self.verify
 
-        if self.apiKey is None:
-            logging.warning("VRC API Key has not been fetched, fetching")
+        api_key = self.config.api_key
+        if api_key is None:
+            api_key = await self.config.get_api_key(self)
 
-            j = None
+        try:
+            return await self._send(path, method, headers, params, jdict,
+                no_auth, verify, api_key, priority, timeout, trace)
+        except RequestErrors.InvalidApiKey:
+            logging.warning("VRC API Key was rejected, refetching")
 
-            async with aiohttp.ClientSession(headers={"user-agent": self.user_agent}) as session:
-                async with session.get(self.base + "/config") as resp:
-                    assert resp.status == 200
-                    j = await resp.json()
+            api_key = await self.config.refresh(self, api_key)
+            await self._pace(path, priority)
+            return await self._send(path, method, headers, params, jdict,
+                no_auth, verify, api_key, priority, timeout, trace)
 
-            try:
-                self.apiKey = j["apiKey"]
-            except:
-                raise GeneralErrors.OutOfDate(
-                    "This API wrapper is too outdated to function (https://api.vrchat.cloud/api/1/config doesn't contain apiKey)"
-                )
+    async def _pace(self, path, priority):
+        # Waits for the scheduler to let a request out
+        await self.scheduler.acquire(path, priority)
+        self.sent += 1
+
+    async def _send(self, path, method, headers, params, jdict, no_auth,
+        verify, api_key, priority, timeout=None, trace=None):
+
+        # Copy so we never write into the caller's (or a default) dict
+        params = dict(params)
 
         # Conversion to support py bools in request params
         for param in params:
             if isinstance(params[param], bool):
                 params[param] = str(params[param]).lower()
 
-        params["apiKey"] = self.apiKey
+        params["apiKey"] = api_key
         if no_auth:
-            session = aiohttp.ClientSession(headers={"user-agent": self.user_agent})
-            resp = await session.request(method, self.base + path, params=params,
-                headers=headers, json=jdict, ssl=self.verify)
+            session = self._get_anon_session()
         else:
             if self.session is None:
                 raise RequestErrors.NoSession("No session, not logged in")
 
-            session = None
-            resp = await self.session.request(method, self.base + path, params=params,
-                headers=headers, json=jdict, ssl=self.verify)
+            session = self.session
 
-        logging.debug("%s request at %s -> %s" % (method, path, resp.status))
+        options = {} if timeout is None else {"timeout": timeout}
 
-        if resp.status != 200:
-            content = await resp.content.read()
+        hooks = self.hooks and trace is not None
+        if hooks:
+            trace["start"] = self.loop.time()
+            self._emit("request_start", trace)
 
-            try:
-                json = await resp.json()
-            except:
-                json = None
+        # async with so the connection goes back to the pool whatever happens
+        # (non-200s raising, timeouts, cancellation)
+        async with session.request(method, self.base + path, params=params,
+            headers=headers, json=jdict, ssl=verify, **options) as resp:
+
+            logging.debug("%s request at %s -> %s" % (method, path, resp.status))
+
+            if hooks:
+                trace["status"] = resp.status
+                trace["headers_at"] = self.loop.time()
+                self._emit("response_headers", trace, resp)
+
+            if resp.status == 304:
+                if hooks:
+                    self._decoded(trace, b"", None)
+
+                return {"status": resp.status, "response": resp, "data": None}
 
-            Request.raise_for_status({"status": resp.status, "response": resp,
-                "data": json if json is not None else content})
+            if resp.status != 200:
+                if resp.status == 429:
+                    retry_after = Request._retry_after(resp)
+                    self.scheduler.throttle(path, retry_after)
 
-            raise Exception("Something horrible has gone wrong!")
+                    if hooks:
+                        self._emit("rate_limited", trace, retry_after)
 
-        response = {"status": resp.status, "response": resp, "data": await resp.json()}
+                content = await resp.read()
 
-        # We have to do this since we didn't async with
-        await resp.release()
-        if session is not None:
-            await session.close()
+                try:
+                    json = await resp.json()
+                except:
+                    json = None
 
-        return response
+                if hooks:
+                    self._decoded(trace, content, json)
+
+                Request.raise_for_status({"status": resp.status, "response": resp,
+                    "data": json if json is not None else content})
+
+                raise Exception("Something horrible has gone wrong!")
+
+            data = await resp.json()
+
+            if hooks:
+                # Body is already read, this doesn't touch the socket
+                self._decoded(trace, await resp.read(), data)
+
+            return {"status": resp.status, "response": resp, "data": data}
+
+    def _decoded(self, trace, body, data):
+        trace["bytes"] = len(body)
+        trace["end"] = self.loop.time()
+        self._emit("body_decoded", trace, data)
+
+    @staticmethod
+    def _retry_after(resp):
+        try:
+            return float(resp.headers["Retry-After"])
+        except (KeyError, ValueError):
+            return None
+
+    @staticmethod
+    def _is_api_key_error(data):
+        try:
+            message = str(data["error"]["message"]).lower()
+        except (KeyError, TypeError):
+            return False
+
+        return "apikey" in message or "api key" in message
 
     @staticmethod
     def raise_for_status(resp):
@@ -126,7 +691,8 @@ class Request:
                 raise ClientErrors.MfaInvalid("2FA code is invalid!")
 
         def handle_401():
-            pass
+            if Request._is_api_key_error(resp["data"]):
+                raise RequestErrors.InvalidApiKey(resp["data"]["error"]["message"])
 
         def handle_404():
             pass
@@ -137,10 +703,15 @@ class Request:
         switch = {
             400: lambda: handle_400(),
             401: lambda: handle_401(),
+            403: lambda: handle_401(),
             404: lambda: handle_404(),
             429: lambda: handle_429()
         }
 
         if resp["response"].status in switch:
             switch[resp["response"].status]()
+
+        if resp["response"].status >= 500:
+            raise RequestErrors.ServerError(
+                "Server error {}".format(resp["response"].status))
         print(resp)
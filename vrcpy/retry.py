@@ -0,0 +1,76 @@
+import random
+import asyncio
+import aiohttp
+
+from vrcpy.errors import RequestErrors
+
+class RetryPolicy:
+    '''
+    Decides which failed requests get retried and how long to wait
+    Subclass and override should_retry/delay for custom behaviour
+    '''
+
+    # Safe to send twice
+    idempotent_methods = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+    # Failures that might go away by themselves
+    transient_errors = (
+        aiohttp.ClientConnectionError,
+        aiohttp.ClientPayloadError,
+        asyncio.TimeoutError,
+        RequestErrors.ServerError,
+        RequestErrors.RateLimit
+    )
+
+    def __init__(self, retries=1, base_delay=0.5, max_delay=30, deadline=60, jitter=True):
+        '''
+            retries, int
+            Max retries after the first attempt
+
+            base_delay, int/float
+            Delay before the first retry, doubles every retry
+
+            max_delay, int/float
+            Cap on a single delay
+
+            deadline, int/float
+            Seconds from the first attempt after which we stop retrying
+            None for no deadline
+
+            jitter, bool
+            Randomise delays (full jitter) so clients don't retry in step
+        '''
+
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.jitter = jitter
+
+    def should_retry(self, method, error):
+        '''
+        Returns if a request should be retried
+
+            method, str
+            HTTP method of the request
+
+            error, Exception
+            What the attempt raised
+        '''
+
+        return method.upper() in self.idempotent_methods \
+            and isinstance(error, self.transient_errors)
+
+    def delay(self, attempt):
+        '''
+        Returns seconds to wait before a retry
+
+            attempt, int
+            Number of the attempt that failed, from 0
+        '''
+
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+
+        if self.jitter:
+            return random.uniform(0, delay)
+        return delay
@@ -0,0 +1,147 @@
+from vrcpy.user import LimitedUser, User, CurrentUser
+from vrcpy.world import LimitedWorld, World, Instance
+
+import os
+import json
+import gzip
+import time
+import logging
+
+# Bump when the layout changes, older snapshots are then ignored
+snapshot_version = 1
+
+# Classes objects are saved as, by name
+snapshot_classes = {
+    cls.__name__: cls for cls in (LimitedUser, User, CurrentUser, LimitedWorld, World, Instance)
+}
+
+def dump_snapshot(client):
+    '''
+    Returns dict of the client's state, only raw api payloads are kept
+        "me", CurrentUser payload
+        "friends", list of [class name, payload]
+        "worlds", list of [class name, payload] of live world objects
+        "instances", list of [world id, instance id, unix time it
+            expires, payload] of unexpired instances in the instance cache
+
+        client, Client
+        Client to snapshot
+    '''
+
+    worlds = []
+    for (kind, id), obj in list(client._identity.items()):
+        if kind == "world":
+            worlds.append([type(obj).__name__, obj.raw])
+
+    now = time.time()
+    loop_now = client.loop.time()
+
+    instances = [
+        [world_id, instance_id, now + expires - loop_now, instance.raw]
+        for (world_id, instance_id), (expires, instance) in client._instance_cache.items()
+        if expires > loop_now
+    ]
+
+    return {
+        "version": snapshot_version,
+        "saved_at": now,
+        "me": None if client.me is None else client.me.raw,
+        "friends": [[type(user).__name__, user.raw] for user in client.friends],
+        "worlds": worlds,
+        "instances": instances
+    }
+
+def write_snapshot(path, data):
+    '''
+    Writes a snapshot to path as gzipped json, readable by the owner only
+
+        path, str
+        File to write to
+
+        data, dict
+        From dump_snapshot
+    '''
+
+    # Write then rename so a crash never leaves half a snapshot
+    tmp = "%s.%s.tmp" % (path, os.getpid())
+
+    # Owner only, me holds the account's email and steam details
+    #   (a leftover tmp file would keep its old mode, so remove it)
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+    with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=5) as file:
+        file.write(json.dumps(data, separators=(",", ":")).encode())
+
+    os.replace(tmp, path)
+
+def read_snapshot(path, max_age=None):
+    '''
+    Returns snapshot dict from path, None if there isn't a usable one
+
+        path, str
+        File to read
+
+        max_age, int
+        Seconds after which a snapshot is too old to use, None for any age
+    '''
+
+    if not os.path.isfile(path):
+        return None
+
+    try:
+        with gzip.open(path, "rb") as file:
+            data = json.loads(file.read())
+    except (OSError, ValueError, EOFError):
+        logging.warning("Couldn't read snapshot " + path)
+        return None
+
+    if data.get("version") != snapshot_version:
+        logging.info("Ignoring snapshot %s of another version" % path)
+        return None
+
+    if max_age is not None and time.time() - data["saved_at"] > max_age:
+        logging.info("Ignoring snapshot %s, too old" % path)
+        return None
+
+    return data
+
+def apply_snapshot(client, data):
+    '''
+    Fills the client's me, friend cache, worlds and instance cache
+    from a snapshot
+    Returns list of the world and instance objects made, they're only
+    weakly held by the client so should be kept referenced
+
+        client, Client
+        Client to fill
+
+        data, dict
+        From read_snapshot
+    '''
+
+    if data["me"] is not None:
+        client.me = CurrentUser(client, data["me"], client.loop)
+
+    for name, raw in data["friends"]:
+        client.friends.put(client._canonical(snapshot_classes[name], raw))
+
+    objects = []
+    for name, raw in data["worlds"]:
+        objects.append(client._canonical(snapshot_classes[name], raw))
+
+    # Instances change quickly, only use them for what's left of their TTL
+    now = time.time()
+    for world_id, instance_id, expires, raw in data["instances"]:
+        if expires <= now:
+            continue
+
+        instance = client._canonical(Instance, raw)
+        objects.append(instance)
+
+        client._instance_cache[(world_id, instance_id)] = (
+            client.loop.time() + expires - now, instance)
+
+    return objects
@@ -1,77 +1,85 @@
 from vrcpy.errors import ObjectErrors
 from vrcpy.baseobject import BaseObject
+from vrcpy.ratelimit import Priority
+from vrcpy.paginator import Paginator
 
 import logging
+import asyncio
 
 class LimitedUser(BaseObject):
+    _identity_kind = "user"
+
+    required = {
+        "username": {
+            "dict_key": "username",
+            "type": str
+        },
+        "display_name": {
+            "dict_key": "displayName",
+            "type": str
+        },
+        "id": {
+            "dict_key": "id",
+            "type": str
+        },
+        "avatar_image_url": {
+            "dict_key": "currentAvatarImageUrl",
+            "type": str
+        },
+        "avatar_thumbnail_url": {
+            "dict_key": "currentAvatarThumbnailImageUrl",
+            "type": str
+        },
+        "last_platform": {
+            "dict_key": "last_platform",
+            "type": str
+        },
+        "tags": {
+            "dict_key": "tags",
+            "type": list
+        },
+        "developer_type": {
+            "dict_key": "developerType",
+            "type": str
+        },
+        "is_friend": {
+            "dict_key": "isFriend",
+            "type": bool
+        }
+    }
+
+    optional = {
+        "status": {
+            "dict_key": "status",
+            "type": str
+        },
+        "bio": {
+            "dict_key": "bio",
+            "type": str
+        },
+        "location": {
+            "dict_key": "location",
+            "type": str
+        }
+    }
+
     def __init__(self, client, obj=None, loop=None):
         super().__init__(client, loop=loop)
 
-        self.required.update({
-            "username": {
-                "dict_key": "username",
-                "type": str
-            },
-            "display_name": {
-                "dict_key": "displayName",
-                "type": str
-            },
-            "id": {
-                "dict_key": "id",
-                "type": str
-            },
-            "avatar_image_url": {
-                "dict_key": "currentAvatarImageUrl",
-                "type": str
-            },
-            "avatar_thumbnail_url": {
-                "dict_key": "currentAvatarThumbnailImageUrl",
-                "type": str
-            },
-            "last_platform": {
-                "dict_key": "last_platform",
-                "type": str
-            },
-            "tags": {
-                "dict_key": "tags",
-                "type": list
-            },
-            "developer_type": {
-                "dict_key": "developerType",
-                "type": str
-            },
-            "is_friend": {
-                "dict_key": "isFriend",
-                "type": bool
-            }
-        })
-
-        self.optional.update({
-            "status": {
-                "dict_key": "status",
-                "type": str
-            },
-            "bio": {
-                "dict_key": "bio",
-                "type": str
-            },
-            "location": {
-                "dict_key": "location",
-                "type": str
-            }
-        })
-
         if obj is not None:
             self._assign(obj)
 
-    async def fetch_full(self):
+    async def fetch_full(self, priority=Priority.interactive):
         '''
         Returns this user as a User object
+
+            priority, int
+            Request priority lane, see vrcpy.ratelimit.Priority
         '''
 
         logging.info("Getting User object of user " + self.username)
 
-        return await self.client.fetch_user_via_id(self.id)
+        return await self.client.fetch_user_via_id(self.id, priority)
 
     async def send_friend_request(self):
         '''
@@ -132,190 +140,261 @@ class LimitedUser(BaseObject):
         return self.client._BaseFavorite.build_favorite(self.client, resp["data"], self.loop)
 
 class User(LimitedUser):
+    required = {
+        "status_description": {
+            "dict_key": "statusDescription",
+            "type": str
+        },
+        "last_login": {
+            "dict_key": "last_login",
+            "type": str
+        }
+    }
+
+    optional = {
+        "bio_links": {
+            "dict_key": "bioLinks",
+            "type": list
+        },
+        "state": {
+            "dict_key": "state",
+            "type": str
+        },
+        "friend_key": {
+            "dict_key": "friendKey",
+            "type": str
+        },
+        "world_id": {
+            "dict_key": "worldId",
+            "type": str
+        },
+        "instance_id": {
+            "dict_key": "instanceId",
+            "type": str
+        },
+        "allow_avatar_copying": {
+            "dict_key": "allowAvatarCopying",
+            "type": bool
+        }
+    }
+
     def __init__(self, client, obj=None, loop=None):
         super().__init__(client, loop=loop)
 
-        self.required.update({
-            "status_description": {
-                "dict_key": "statusDescription",
-                "type": str
-            },
-            "last_login": {
-                "dict_key": "last_login",
-                "type": str
-            }
-        })
-
-        self.optional.update({
-            "bio_links": {
-                "dict_key": "bioLinks",
-                "type": list
-            },
-            "state": {
-                "dict_key": "state",
-                "type": str
-            },
-            "friend_key": {
-                "dict_key": "friendKey",
-                "type": str
-            },
-            "world_id": {
-                "dict_key": "worldId",
-                "type": str
-            },
-            "instance_id": {
-                "dict_key": "instanceId",
-                "type": str
-            },
-            "allow_avatar_copying": {
-                "dict_key": "allowAvatarCopying",
-                "type": bool
-            }
-        })
-
         if obj is not None:
             self._assign(obj)
 
 class CurrentUser(User):
+    required = {
+        "past_display_names": {
+            "dict_key": "pastDisplayNames",
+            "type": list
+        },
+        "email_verified": {
+            "dict_key": "emailVerified",
+            "type": bool
+        },
+        "has_email": {
+            "dict_key": "hasEmail",
+            "type": bool
+        },
+        "has_pending_email": {
+            "dict_key": "hasPendingEmail",
+            "type": bool
+        },
+        "accepted_tos_version": {
+            "dict_key": "acceptedTOSVersion",
+            "type": int
+        },
+        "has_birthday": {
+            "dict_key": "hasBirthday",
+            "type": bool
+        },
+        "friends": {
+            "dict_key": "friends",
+            "type": list
+        },
+        "online_friends": {
+            "dict_key": "onlineFriends",
+            "type": list
+        },
+        "active_friends": {
+            "dict_key": "activeFriends",
+            "type": list
+        },
+        "offline_friends": {
+            "dict_key": "offlineFriends",
+            "type": list
+        },
+        "friend_group_names": {
+            "dict_key": "friendGroupNames",
+            "type": list
+        },
+        "avatar": {
+            "dict_key": "currentAvatar",
+            "type": dict
+        },
+        "avatar_asset_url": {
+            "dict_key": "currentAvatarAssetUrl",
+            "type": str
+        },
+        "home_location": {
+            "dict_key": "homeLocation",
+            "type": str
+        },
+        "has_logged_in_from_client": {
+            "dict_key": "hasLoggedInFromClient",
+            "type": bool
+        },
+        "mfa_enabled": {
+            "dict_key": "twoFactorAuthEnabled",
+            "type": bool
+        },
+        "unsubscribe": {
+            "dict_key": "unsubscribe",
+            "type": bool
+        },
+        "feature": {
+            "dict_key": "feature",
+            "type": dict
+        }
+    }
+
+    optional = {
+        "email": {
+            "dict_key": "email",
+            "type": str
+        },
+        "obfuscated_email": {
+            "dict_key": "obfuscatedEmail",
+            "type": str
+        },
+        "obfuscated_pending_email": {
+            "dict_key": "obfuscatedPendingEmail",
+            "type": str
+        },
+        "steam_id": {
+            "dict_key": "steamId",
+            "type": str
+        },
+        "steam_details": {
+            "dict_key": "steamDetails",
+            "type": dict
+        },
+        "oculus_id": {
+            "dict_key": "oculusId",
+            "type": str
+        },
+        "account_deletion_date": {
+            "dict_key": "accountDeletionDate",
+            "type": str
+        }
+    }
+
     def __init__(self, client, obj, loop=None):
         super().__init__(client, loop=loop)
 
-        self.required.update({
-            "past_display_names": {
-                "dict_key": "pastDisplayNames",
-                "type": list
-            },
-            "email_verified": {
-                "dict_key": "emailVerified",
-                "type": bool
-            },
-            "has_email": {
-                "dict_key": "hasEmail",
-                "type": bool
-            },
-            "has_pending_email": {
-                "dict_key": "hasPendingEmail",
-                "type": bool
-            },
-            "accepted_tos_version": {
-                "dict_key": "acceptedTOSVersion",
-                "type": int
-            },
-            "has_birthday": {
-                "dict_key": "hasBirthday",
-                "type": bool
-            },
-            "friends": {
-                "dict_key": "friends",
-                "type": list
-            },
-            "online_friends": {
-                "dict_key": "onlineFriends",
-                "type": list
-            },
-            "active_friends": {
-                "dict_key": "activeFriends",
-                "type": list
-            },
-            "offline_friends": {
-                "dict_key": "offlineFriends",
-                "type": list
-            },
-            "friend_group_names": {
-                "dict_key": "friendGroupNames",
-                "type": list
-            },
-            "avatar": {
-                "dict_key": "currentAvatar",
-                "type": dict
-            },
-            "avatar_asset_url": {
-                "dict_key": "currentAvatarAssetUrl",
-                "type": str
-            },
-            "home_location": {
-                "dict_key": "homeLocation",
-                "type": str
-            },
-            "has_logged_in_from_client": {
-                "dict_key": "hasLoggedInFromClient",
-                "type": bool
-            },
-            "mfa_enabled": {
-                "dict_key": "twoFactorAuthEnabled",
-                "type": bool
-            },
-            "unsubscribe": {
-                "dict_key": "unsubscribe",
-                "type": bool
-            },
-            "feature": {
-                "dict_key": "feature",
-                "type": dict
-            }
-        })
-
-        self.optional.update({
-            "email": {
-                "dict_key": "email",
-                "type": str
-            },
-            "obfuscated_email": {
-                "dict_key": "obfuscatedEmail",
-                "type": str
-            },
-            "obfuscated_pending_email": {
-                "dict_key": "obfuscatedPendingEmail",
-                "type": str
-            },
-            "steam_id": {
-                "dict_key": "steamId",
-                "type": str
-            },
-            "steam_details": {
-                "dict_key": "steamDetails",
-                "type": dict
-            },
-            "oculus_id": {
-                "dict_key": "oculusId",
-                "type": str
-            },
-            "account_deletion_date": {
-                "dict_key": "accountDeletionDate",
-                "type": str
-            }
-        })
-
         self._assign(obj)
 
-    async def fetch_friends(self):
+    def iter_friends(self, offline=False, page_size=100, limit=None, prefetch=True):
+        '''
+        Returns a Paginator of User objects, for streaming friends
+        without holding them all in memory
+
+            async for friend in client.me.iter_friends():
+                ...
+
+            offline, bool
+            Page through offline friends instead of online ones
+
+            page_size, int
+            Friends requested per page
+
+            limit, int
+            Max friends to yield, None for all of them
+
+            prefetch, bool
+            Fetch the next page while the current one is consumed
         '''
-        Returns list of LimitedUser objects
+
+        # Pages go out later, so this is as early as any of them can be
+        since = self.client._event_seq
+
+        return Paginator(
+            self.client, "/auth/user/friends",
+            lambda obj: self.client._canonical(User, obj, since),
+            params={"offline": offline}, page_size=page_size,
+            limit=limit, prefetch=prefetch
+        )
+
+    async def fetch_friends(self, concurrency=4):
+        '''
+        Returns list of User objects
+        Online friends come first, then offline friends
+        See iter_friends() to stream them a page at a time instead
+
+            concurrency, int
+            Max number of pages to request at once
         '''
 
+        since = self.client._event_seq
+
+        return [self.client._canonical(User, user, since)
+            for user in await self._fetch_friend_payloads(concurrency)]
+
+    async def _fetch_friend_payloads(self, concurrency=4):
+        # Returns list of raw friend payloads, online first
         logging.info("Fetching friends")
 
-        friends = []
+        semaphore = asyncio.Semaphore(max(1, concurrency))
 
-        for offset in range(0,
-            len(self.online_friends) + len(self.offline_friends),
-            100):
+        online, offline = await asyncio.gather(
+            self._fetch_friend_pages(False, len(self.online_friends), semaphore),
+            self._fetch_friend_pages(True, len(self.offline_friends), semaphore)
+        )
 
-            resp = await self.client.request.call("/auth/user/friends", params={
-                "offset": offset,
-                "n": 100,
-                "offline": False})
+        return online + offline
 
-            for user in resp["data"]:
-                friends.append(User(self.client, user, self.loop))
+    async def _fetch_friend_pages(self, offline, expected, semaphore, page_size=100):
+        # Fires every page we expect at once (bounded by semaphore)
+        # Pages past the first short page are skipped or dropped
 
-        for offset in range(0, len(self.offline_friends), 100):
-            resp = await self.client.request.call("/auth/user/friends", params={
-                "offset": offset,
-                "n": 100,
-                "offline": True})
+        pages = {}
+        last_page = None
+
+        async def fetch_page(offset):
+            nonlocal last_page
+
+            async with semaphore:
+                if last_page is not None and offset > last_page:
+                    return
+
+                resp = await self.client.request.call("/auth/user/friends", params={
+                    "offset": offset,
+                    "n": page_size,
+                    "offline": offline})
+
+            pages[offset] = resp["data"]
+
+            if len(resp["data"]) < page_size:
+                if last_page is None or offset < last_page:
+                    last_page = offset
+
+        await asyncio.gather(*[
+            fetch_page(offset) for offset in range(0, expected, page_size)
+        ])
+
+        # Friend count grew since we got our user, keep going until a short page
+        offset = len(pages) * page_size
+        while offset and last_page is None:
+            await fetch_page(offset)
+            offset += page_size
+
+        friends = []
+        for offset in sorted(pages):
+            if last_page is not None and offset > last_page:
+                break
 
-            for user in resp["data"]:
-                friends.append(User(self.client, user, self.loop))
+            friends += pages[offset]
 
         return friends
@@ -1,90 +1,94 @@
 from vrcpy.baseobject import BaseObject
+from vrcpy.ratelimit import Priority
 
 import logging
+import asyncio
 
 class LimitedWorld(BaseObject):
+    _identity_kind = "world"
+
+    required = {
+        "name": {
+            "dict_key": "name",
+            "type": str
+        },
+        "id": {
+            "dict_key": "id",
+            "type": str
+        },
+        "author_name": {
+            "dict_key": "authorName",
+            "type": str
+        },
+        "author_id": {
+            "dict_key": "authorId",
+            "type": str
+        },
+        "tags": {
+            "dict_key": "tags",
+            "type": list
+        },
+        "created_at": {
+            "dict_key": "created_at",
+            "type": str
+        },
+        "updated_at": {
+            "dict_key": "updated_at",
+            "type": str
+        },
+        "release_status": {
+            "dict_key": "releaseStatus",
+            "type": str
+        },
+        "visits": {
+            "dict_key": "visits",
+            "type": int
+        },
+        "capacity": {
+            "dict_key": "capacity",
+            "type": int
+        },
+        "favorites": {
+            "dict_key": "favorites",
+            "type": int
+        },
+        "popularity": {
+            "dict_key": "popularity",
+            "type": int
+        },
+        "image_url": {
+            "dict_key": "imageUrl",
+            "type": str
+        },
+        "thumbnail_image_url": {
+            "dict_key": "thumbnailImageUrl",
+            "type": str
+        },
+        "heat": {
+            "dict_key": "heat",
+            "type": int
+        },
+        "publication_date": {
+            "dict_key": "publicationDate",
+            "type": str
+        },
+        "labs_publication_date": {
+            "dict_key": "labsPublicationDate",
+            "type": str
+        },
+        "unity_packages": {
+            "dict_key": "unityPackages",
+            "type": str
+        },
+        "occupants": {
+            "dict_key": "occupants",
+            "type": int
+        }
+    }
+
     def __init__(self, client, obj=None, loop=None):
         super().__init__(client, loop)
 
-        self.required.update({
-            "name": {
-                "dict_key": "name",
-                "type": str
-            },
-            "id": {
-                "dict_key": "id",
-                "type": str
-            },
-            "author_name": {
-                "dict_key": "authorName",
-                "type": str
-            },
-            "author_id": {
-                "dict_key": "authorId",
-                "type": str
-            },
-            "tags": {
-                "dict_key": "tags",
-                "type": list
-            },
-            "created_at": {
-                "dict_key": "created_at",
-                "type": str
-            },
-            "updated_at": {
-                "dict_key": "updated_at",
-                "type": str
-            },
-            "release_status": {
-                "dict_key": "releaseStatus",
-                "type": str
-            },
-            "visits": {
-                "dict_key": "visits",
-                "type": int
-            },
-            "capacity": {
-                "dict_key": "capacity",
-                "type": int
-            },
-            "favorites": {
-                "dict_key": "favorites",
-                "type": int
-            },
-            "popularity": {
-                "dict_key": "popularity",
-                "type": int
-            },
-            "image_url": {
-                "dict_key": "imageUrl",
-                "type": str
-            },
-            "thumbnail_image_url": {
-                "dict_key": "thumbnailImageUrl",
-                "type": str
-            },
-            "heat": {
-                "dict_key": "heat",
-                "type": int
-            },
-            "publication_date": {
-                "dict_key": "publicationDate",
-                "type": str
-            },
-            "labs_publication_date": {
-                "dict_key": "labsPublicationDate",
-                "type": str
-            },
-            "unity_packages": {
-                "dict_key": "unityPackages",
-                "type": str
-            },
-            "occupants": {
-                "dict_key": "occupants",
-                "type": int
-            }
-        })
-
         if obj is not None:
             self._assign(obj)
 
@@ -110,129 +114,189 @@ class LimitedWorld(BaseObject):
         return self.client._BaseFavorite.build_favorite(self.client, resp["data"], self.loop)
 
 class World(LimitedWorld):
-    def __init__(self, client, obj, loop=None):
-        super().__init__(client, loop)
+    required = {
+        "description": {
+            "dict_key": "description",
+            "type": str
+        },
+        "version": {
+            "dict_key": "version",
+            "type": int
+        },
+        "featured": {
+            "dict_key": "featured",
+            "type": bool
+        },
+        "public_occupants": {
+            "dict_key": "publicOccupants",
+            "type": int
+        },
+        "private_occupants": {
+            "dict_key": "privateOccupants",
+            "type": int
+        },
+        "asset_url": {
+            "dict_key": "assetUrl",
+            "type": str
+        },
+        "instances": {
+            "dict_key": "instances",
+            "type": list
+        }
+    }
 
-        self.required.update({
-            "description": {
-                "dict_key": "description",
-                "type": str
-            },
-            "version": {
-                "dict_key": "version",
-                "type": int
-            },
-            "featured": {
-                "dict_key": "featured",
-                "type": bool
-            },
-            "public_occupants": {
-                "dict_key": "publicOccupants",
-                "type": int
-            },
-            "private_occupants": {
-                "dict_key": "privateOccupants",
-                "type": int
-            },
-            "asset_url": {
-                "dict_key": "assetUrl",
-                "type": str
-            },
-            "instances": {
-                "dict_key": "instances",
-                "type": list
-            }
-        })
+    def __init__(self, client, obj, loop=None):
+        super().__init__(client, loop=loop)
 
+        self.instances_task = None
         self._assign(obj)
 
+    def _refresh(self, obj, cls=None):
+        super()._refresh(obj, cls)
+
+        # instances is a list of ids again, a fetch still running is of
+        #   the old list so its result is dropped (see _fetch_instances)
+        self.instances_task = None
+
+        if self._should_cache():
+            self._start_caching()
+
+    def _should_cache(self):
+        # Only fetch instances on creation if the client asks for it
+        return getattr(self.client, "hydrate_instances", False)
+
     async def __cinit__(self):
+        await self.fetch_instances()
+
+    async def fetch_instances(self, concurrency=5):
+        '''
+        Replaces self.instances with a list of Instance objects
+        Returns list of Instance objects
+
+        Instances that fail to fetch (closed since) are left out
+
+            concurrency, int
+            Max number of instances to fetch at once
+        '''
+
+        task = self.instances_task
+        if task is None:
+            task = self.instances_task = self.loop.create_task(self._fetch_instances(concurrency))
+
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            if self.instances_task is task:
+                self.instances_task = None
+            raise
+
+    async def _fetch_instances(self, concurrency):
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def fetch(instance_id):
+            async with semaphore:
+                logging.debug("Caching instance %s for world %s" % (instance_id, self.name))
+
+                return await self.client.fetch_instance_via_id(self.id, instance_id,
+                    Priority.background)
+
+        results = await asyncio.gather(
+            *[fetch(instance[0]) for instance in self.instances],
+            return_exceptions=True
+        )
+
         instances = []
-        for instance in self.instances:
-            logging.debug("Caching instance %s for world %s" % (instance[0], self.name))
+        for instance in results:
+            if isinstance(instance, Exception):
+                logging.warning("Failed to cache instance for world %s (%s)" % (self.name, instance))
+            else:
+                instances.append(instance)
 
-            instance = await self.client.fetch_instance_via_id(self.id, instance[0])
-            instances.append(instance)
+        # Only if the world wasn't refreshed while we were fetching
+        if self.instances_task is asyncio.current_task():
+            self.instances = instances
 
-        self.instances = instances
-        self.caching_finished = True
+        return instances
 
 # TODO: Finish Instance class
 class Instance(BaseObject):
+    _identity_kind = "instance"
+    _identity_key = "location"
+
+    required = {
+        "name": {
+            "dict_key": "name",
+            "type": str
+        },
+        "id": {
+            "dict_key": "id",
+            "type": str
+        },
+        "type": {
+            "dict_key": "type",
+            "type": str
+        },
+        "active": {
+            "dict_key": "active",
+            "type": bool
+        },
+        "n_users": {
+            "dict_key": "n_users",
+            "type": int
+        },
+        "capacity": {
+            "dict_key": "capacity",
+            "type": int
+        },
+        "full": {
+            "dict_key": "full",
+            "type": bool
+        },
+        "can_request_invite": {
+            "dict_key": "canRequestInvite",
+            "type": bool
+        },
+        "location": {
+            "dict_key": "location",
+            "type": str
+        },
+        "instance_id": {
+            "dict_key": "instanceId",
+            "type": str
+        },
+        "short_name": {
+            "dict_key": "shortName",
+            "type": str
+        },
+        "owner_id": {
+            "dict_key": "ownerId",
+            "type": str
+        },
+        "world_id": {
+            "dict_key": "worldId",
+            "type": str
+        },
+        "tags": {
+            "dict_key": "tags",
+            "type": list
+        },
+        "platforms": {
+            "dict_key": "platforms",
+            "type": dict
+        },
+        "permanent": {
+            "dict_key": "permanent",
+            "type": bool
+        },
+        "hidden": {
+            "dict_key": "hidden",
+            "type": str
+        }
+    }
+
     def __init__(self, client, obj, loop=None):
         super().__init__(client, loop)
 
-        self.required.update({
-            "name": {
-                "dict_key": "name",
-                "type": str
-            },
-            "id": {
-                "dict_key": "id",
-                "type": str
-            },
-            "type": {
-                "dict_key": "type",
-                "type": str
-            },
-            "active": {
-                "dict_key": "active",
-                "type": bool
-            },
-            "n_users": {
-                "dict_key": "n_users",
-                "type": int
-            },
-            "capacity": {
-                "dict_key": "capacity",
-                "type": int
-            },
-            "full": {
-                "dict_key": "full",
-                "type": bool
-            },
-            "can_request_invite": {
-                "dict_key": "canRequestInvite",
-                "type": bool
-            },
-            "location": {
-                "dict_key": "location",
-                "type": str
-            },
-            "instance_id": {
-                "dict_key": "instanceId",
-                "type": str
-            },
-            "short_name": {
-                "dict_key": "shortName",
-                "type": str
-            },
-            "owner_id": {
-                "dict_key": "ownerId",
-                "type": str
-            },
-            "world_id": {
-                "dict_key": "worldId",
-                "type": str
-            },
-            "tags": {
-                "dict_key": "tags",
-                "type": list
-            },
-            "platforms": {
-                "dict_key": "platforms",
-                "type": dict
-            },
-            "permanent": {
-                "dict_key": "permanent",
-                "type": bool
-            },
-            "hidden": {
-                "dict_key": "hidden",
-                "type": str
-            }
-        })
-
         self._assign(obj)
 
     async def get_world(self):
@@ -244,4 +308,4 @@ class Instance(BaseObject):
         logging.info("Getting instance world of id " + self.world_id)
 
         world = await self.client.request.call("/worlds/"+self.world_id)
-        return World(self.client, world["data"], self.loop)
+        return self.client._canonical(World, world["data"])